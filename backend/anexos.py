@@ -0,0 +1,163 @@
+import asyncio
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+# Tamanho dos blocos lidos/escritos no armazenamento de anexos
+CHUNK_SIZE = 256 * 1024
+
+# Únicos tipos servidos inline. Os anexos são baixados da mesma origem do
+# frontend, então HTML, SVG ou scripts enviados como anexo são gravados como
+# application/octet-stream e entregues como download
+TIPOS_INLINE = frozenset({
+    "application/pdf", "image/png", "image/jpeg", "image/gif", "image/webp"
+})
+
+
+def normalizar_content_type(valor):
+    tipo = (valor or "").split(";", 1)[0].strip().lower()
+    return tipo if tipo in TIPOS_INLINE else "application/octet-stream"
+
+
+class LocalAnexoStorage:
+    """Armazena anexos no sistema de arquivos local.
+
+    Os arquivos são endereçados por conteúdo (<organização>/<sha256>), então
+    o mesmo documento enviado duas vezes ocupa espaço uma única vez.
+    """
+
+    def __init__(self, raiz: Path):
+        self.raiz = Path(raiz)
+        self.tmp = self.raiz / "tmp"
+        self.tmp.mkdir(parents=True, exist_ok=True)
+
+    def _caminho(self, chave: str):
+        organizacao_id, sha256 = chave.split("/", 1)
+        return self.raiz / organizacao_id / sha256[:2] / sha256
+
+    def novo_temporario(self):
+        return self.tmp / str(uuid.uuid4())
+
+    async def existe(self, chave: str):
+        return await asyncio.to_thread(self._caminho(chave).exists)
+
+    async def salvar(self, chave: str, temporario: Path):
+        destino = self._caminho(chave)
+
+        def mover():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temporario, destino)
+
+        await asyncio.to_thread(mover)
+
+    async def ler(self, chave: str, inicio: int, fim: int):
+        # Lê apenas o intervalo [inicio, fim], bloco a bloco
+        arquivo = await asyncio.to_thread(open, self._caminho(chave), "rb")
+        try:
+            await asyncio.to_thread(arquivo.seek, inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = await asyncio.to_thread(arquivo.read, min(CHUNK_SIZE, restante))
+                if not bloco:
+                    break
+                restante -= len(bloco)
+                yield bloco
+        finally:
+            await asyncio.to_thread(arquivo.close)
+
+    async def remover(self, chave: str):
+        await asyncio.to_thread(self._caminho(chave).unlink, missing_ok=True)
+
+
+class S3AnexoStorage:
+    """Armazena anexos em um bucket S3 (ou compatível, via endpoint_url)."""
+
+    def __init__(self, bucket: str, endpoint_url=None, prefixo: str = "anexos/"):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("ANEXOS_BACKEND=s3 requer o pacote boto3")
+        self.s3 = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.tmp = Path(tempfile.gettempdir())
+
+    def _key(self, chave: str):
+        return f"{self.prefixo}{chave}"
+
+    def novo_temporario(self):
+        return self.tmp / f"anexo-{uuid.uuid4()}"
+
+    async def existe(self, chave: str):
+        from botocore.exceptions import ClientError
+        try:
+            await asyncio.to_thread(self.s3.head_object, Bucket=self.bucket, Key=self._key(chave))
+            return True
+        except ClientError:
+            return False
+
+    async def salvar(self, chave: str, temporario: Path):
+        # upload_file divide arquivos grandes em multipart automaticamente
+        try:
+            await asyncio.to_thread(
+                self.s3.upload_file, str(temporario), self.bucket, self._key(chave)
+            )
+        finally:
+            await asyncio.to_thread(temporario.unlink, missing_ok=True)
+
+    async def ler(self, chave: str, inicio: int, fim: int):
+        resposta = await asyncio.to_thread(
+            self.s3.get_object,
+            Bucket=self.bucket,
+            Key=self._key(chave),
+            Range=f"bytes={inicio}-{fim}"
+        )
+        corpo = resposta["Body"]
+        try:
+            while True:
+                bloco = await asyncio.to_thread(corpo.read, CHUNK_SIZE)
+                if not bloco:
+                    break
+                yield bloco
+        finally:
+            corpo.close()
+
+    async def remover(self, chave: str):
+        await asyncio.to_thread(self.s3.delete_object, Bucket=self.bucket, Key=self._key(chave))
+
+
+def criar_anexo_storage(backend: str, raiz: Path, bucket=None, endpoint_url=None):
+    if backend == "s3":
+        if not bucket:
+            raise RuntimeError("ANEXOS_BACKEND=s3 requer ANEXOS_S3_BUCKET")
+        return S3AnexoStorage(bucket, endpoint_url=endpoint_url)
+    return LocalAnexoStorage(raiz)
+
+
+def parse_range(cabecalho, tamanho: int):
+    """Converte um cabeçalho Range de intervalo único em (inicio, fim).
+
+    Retorna None quando o cabeçalho deve ser ignorado (ausente, múltiplos
+    intervalos ou unidade diferente de bytes) e levanta ValueError quando
+    o intervalo não pode ser atendido (416).
+    """
+    if not cabecalho or not cabecalho.startswith("bytes=") or "," in cabecalho:
+        return None
+    if tamanho == 0:
+        raise ValueError("arquivo vazio")
+    inicio_txt, _, fim_txt = cabecalho[len("bytes="):].strip().partition("-")
+    try:
+        if inicio_txt == "":
+            # bytes=-N: os últimos N bytes
+            sufixo = int(fim_txt)
+            if sufixo <= 0:
+                raise ValueError("intervalo vazio")
+            return max(tamanho - sufixo, 0), tamanho - 1
+        inicio = int(inicio_txt)
+        fim = int(fim_txt) if fim_txt else tamanho - 1
+    except ValueError:
+        raise ValueError("intervalo inválido")
+    if inicio >= tamanho or fim < inicio:
+        raise ValueError("intervalo fora do arquivo")
+    return inicio, min(fim, tamanho - 1)
@@ -0,0 +1,134 @@
+"""Benchmark dos backends de armazenamento com a mesma carga de trabalho.
+
+Cada backend é iniciado pelo mesmo lifespan do servidor e recebe os mesmos
+equipamentos e manutenções (gerados com semente fixa) em uma organização
+exclusiva; em seguida as consultas dos handlers são repetidas e cronometradas.
+
+Uso:
+    python benchmark_repositorios.py --backends memory,sql,mongo \\
+        --equipamentos 200 --manutencoes 5000 --repeticoes 50
+
+O backend sql usa SQLALCHEMY_URL (padrão: SQLite temporário) e o mongo usa
+MONGO_URL/DB_NAME; os dados gerados não são removidos, então aponte para
+bancos descartáveis.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import server
+
+STATUS = ("pendente", "em_andamento", "concluida")
+
+
+def gerar_carga(organizacao_id: str, equipamentos: int, manutencoes: int, semente: int = 42):
+    aleatorio = random.Random(semente)
+    agora = datetime.utcnow()
+    lista_equipamentos = [
+        {
+            "id": str(uuid.uuid4()),
+            "nome": f"Equipamento {i}",
+            "modelo": f"Modelo {i % 10}",
+            "fabricante": f"Fabricante {i % 5}",
+            "organizacao_id": organizacao_id,
+            "created_at": agora - timedelta(days=aleatorio.randint(0, 720)),
+            "updated_at": agora,
+        }
+        for i in range(equipamentos)
+    ]
+    lista_manutencoes = [
+        {
+            "id": str(uuid.uuid4()),
+            "equipamento_id": aleatorio.choice(lista_equipamentos)["id"],
+            "tipo": aleatorio.choice(("preventiva", "corretiva")),
+            "status": aleatorio.choice(STATUS),
+            "data_prevista": agora + timedelta(days=aleatorio.randint(-60, 60)),
+            "organizacao_id": organizacao_id,
+            "created_at": agora - timedelta(days=aleatorio.randint(0, 720)),
+            "updated_at": agora,
+        }
+        for _ in range(manutencoes)
+    ]
+    return lista_equipamentos, lista_manutencoes
+
+
+async def cronometrar(operacao, repeticoes: int):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await operacao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+async def executar(backend: str, args):
+    server.STORAGE_BACKEND = backend
+    # O job de arquivamento não participa da medição
+    server.ARCHIVE_INTERVAL_HOURS = 0
+    # Nenhum token é emitido durante a medição
+    server.JWT_EPHEMERAL_KEYS = True
+    organizacao_id = f"benchmark-{uuid.uuid4().hex[:8]}"
+    equipamentos, manutencoes = gerar_carga(organizacao_id, args.equipamentos, args.manutencoes)
+    resultados = {}
+    async with server.lifespan(server.app):
+        repositorio = server.repositorio
+        inicio = time.perf_counter()
+        for equipamento in equipamentos:
+            await repositorio.criar_equipamento(dict(equipamento))
+        for manutencao in manutencoes:
+            await repositorio.criar_manutencao(dict(manutencao))
+        resultados["carga (total)"] = [(time.perf_counter() - inicio) * 1000]
+
+        hoje = datetime.utcnow()
+        equipamento_id = equipamentos[0]["id"]
+        consultas = {
+            "listar_equipamentos": lambda: repositorio.listar_equipamentos(organizacao_id),
+            "listar_manutencoes": lambda: repositorio.listar_manutencoes(organizacao_id),
+            "historico_equipamento": lambda: repositorio.listar_manutencoes(
+                organizacao_id, equipamento_id=equipamento_id
+            ),
+            "resumo": lambda: repositorio.resumo(organizacao_id),
+            "vencidas": lambda: repositorio.manutencoes_em_aberto(
+                organizacao_id, prevista_antes=hoje
+            ),
+            "proximas": lambda: repositorio.manutencoes_em_aberto(
+                organizacao_id, prevista_desde=hoje, prevista_antes=hoje + timedelta(days=7)
+            ),
+        }
+        for nome, operacao in consultas.items():
+            resultados[nome] = await cronometrar(operacao, args.repeticoes)
+    return resultados
+
+
+def imprimir(backend: str, resultados: dict):
+    print(f"\n== {backend}")
+    print(f"{'operação':<24}{'mediana ms':>12}{'p95 ms':>12}")
+    for nome, tempos in resultados.items():
+        tempos = sorted(tempos)
+        p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+        print(f"{nome:<24}{statistics.median(tempos):>12.2f}{p95:>12.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default="memory,sql")
+    parser.add_argument("--equipamentos", type=int, default=200)
+    parser.add_argument("--manutencoes", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    if not server.SQLALCHEMY_URL:
+        caminho = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        server.SQLALCHEMY_URL = f"sqlite+aiosqlite:///{caminho}"
+    for backend in args.backends.split(","):
+        imprimir(backend, await executar(backend.strip(), args))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+import asyncio
+import collections
+import contextvars
+import json
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Span ativo no contexto atual (requisição, tarefa ou thread do Motor)
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+# Spans finalizados aguardando exportação; limitado para não crescer sem
+# coletor configurado ou com o coletor fora do ar
+_spans_finalizados = collections.deque(maxlen=10000)
+_exportacao_ativa = False
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "nome", "inicio_ns", "fim_ns", "atributos")
+
+    def __init__(self, nome: str, inicio_ns: int, atributos: dict):
+        pai = _span_atual.get()
+        self.trace_id = pai.trace_id if pai else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = pai.span_id if pai else None
+        self.nome = nome
+        self.inicio_ns = inicio_ns
+        self.fim_ns = None
+        self.atributos = atributos
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nome,
+            "kind": 1,
+            "startTimeUnixNano": str(self.inicio_ns),
+            "endTimeUnixNano": str(self.fim_ns),
+            "attributes": [_atributo_otlp(k, v) for k, v in self.atributos.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _atributo_otlp(chave, valor):
+    if isinstance(valor, bool):
+        return {"key": chave, "value": {"boolValue": valor}}
+    if isinstance(valor, int):
+        return {"key": chave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float):
+        return {"key": chave, "value": {"doubleValue": valor}}
+    return {"key": chave, "value": {"stringValue": str(valor)}}
+
+
+def _finalizar(span_finalizado: Span):
+    if _exportacao_ativa:
+        _spans_finalizados.append(span_finalizado)
+
+
+@contextmanager
+def span(nome: str, **atributos):
+    """Mede um trecho de código como span filho do span ativo."""
+    atual = Span(nome, time.time_ns(), atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    finally:
+        atual.fim_ns = time.time_ns()
+        _span_atual.reset(token)
+        _finalizar(atual)
+
+
+def registrar_span(nome: str, duracao_ns: int, **atributos):
+    """Registra um span já concluído (ex.: comando do MongoDB) no contexto atual."""
+    fim_ns = time.time_ns()
+    concluido = Span(nome, fim_ns - duracao_ns, atributos)
+    concluido.fim_ns = fim_ns
+    _finalizar(concluido)
+
+
+def spans_para_otlp(spans, servico: str):
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_atributo_otlp("service.name", servico)]},
+            "scopeSpans": [{
+                "scope": {"name": servico},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }]
+    }
+
+
+def _coletar_spans():
+    spans = []
+    while _spans_finalizados:
+        spans.append(_spans_finalizados.popleft())
+    return spans
+
+
+def _exportar(payload: dict, exportador: str, destino: str):
+    if exportador == "file":
+        # Uma linha OTLP/JSON por lote, compatível com o file receiver do collector
+        with open(destino, "a", encoding="utf-8") as arquivo:
+            arquivo.write(json.dumps(payload) + "\n")
+    else:
+        import urllib.request
+        requisicao = urllib.request.Request(
+            destino,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(requisicao, timeout=5):
+            pass
+
+
+async def exportar_spans_loop(exportador: str, destino: str, intervalo_s: float, servico: str, logger):
+    """Exporta os spans acumulados periodicamente para arquivo ou coletor OTLP/HTTP."""
+    global _exportacao_ativa
+    _exportacao_ativa = True
+    try:
+        while True:
+            await asyncio.sleep(intervalo_s)
+            await _exportar_pendentes(exportador, destino, servico, logger)
+    finally:
+        await _exportar_pendentes(exportador, destino, servico, logger)
+        _exportacao_ativa = False
+
+
+async def _exportar_pendentes(exportador, destino, servico, logger):
+    spans = _coletar_spans()
+    if not spans:
+        return
+    try:
+        await asyncio.to_thread(_exportar, spans_para_otlp(spans, servico), exportador, destino)
+    except Exception as e:
+        logger.warning("Falha ao exportar %s spans: %s", len(spans), e)
+
+
+class SamplingProfiler:
+    """Profiler por amostragem da pilha de uma única thread.
+
+    Uma thread auxiliar lê a pilha da thread alvo (o event loop) a cada
+    intervalo e conta as pilhas no formato "folded" (uma linha
+    "f1;f2;f3 contagem"), aceito por flamegraph.pl e speedscope.
+
+    A amostragem é da thread inteira: outras requisições atendidas pelo
+    mesmo event loop durante a captura também aparecem no profile.
+    """
+
+    def __init__(self, thread_id: int, intervalo_s: float = 0.005):
+        self.thread_id = thread_id
+        self.intervalo_s = intervalo_s
+        self.amostras = collections.Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        # Bloqueia até a próxima amostra terminar; chame fora do event loop
+        self._parar.set()
+        self._thread.join()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            frame = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{codigo.co_name} ({codigo.co_filename}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pilha:
+                self.amostras[";".join(reversed(pilha))] += 1
+
+    def folded(self):
+        return "\n".join(f"{pilha} {total}" for pilha, total in self.amostras.most_common())
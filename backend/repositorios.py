@@ -0,0 +1,374 @@
+import copy
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+
+
+def parse_data(valor):
+    if isinstance(valor, datetime):
+        return valor.replace(tzinfo=None)
+    if isinstance(valor, str) and valor:
+        try:
+            return datetime.fromisoformat(valor.replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+class Repositorio(ABC):
+    """Operações de usuários, equipamentos e manutenções usadas pelos handlers.
+
+    Toda consulta recebe a organização explicitamente; as implementações
+    devolvem dicionários no mesmo formato dos documentos do MongoDB.
+    """
+
+    async def iniciar(self):
+        pass
+
+    async def fechar(self):
+        pass
+
+    @abstractmethod
+    async def ping(self):
+        ...
+
+    @abstractmethod
+    async def buscar_usuario(self, username: str):
+        ...
+
+    @abstractmethod
+    async def criar_usuario(self, usuario: dict):
+        ...
+
+    @abstractmethod
+    async def listar_equipamentos(self, organizacao_id: str, limite: int = 1000):
+        ...
+
+    @abstractmethod
+    async def criar_equipamento(self, equipamento: dict):
+        ...
+
+    @abstractmethod
+    async def listar_manutencoes(
+        self,
+        organizacao_id: str,
+        equipamento_id: Optional[str] = None,
+        data_inicio: Optional[datetime] = None,
+        data_fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+        limite: int = 1000
+    ):
+        ...
+
+    @abstractmethod
+    async def criar_manutencao(self, manutencao: dict):
+        ...
+
+    @abstractmethod
+    async def resumo(self, organizacao_id: str):
+        """Totais do relatório: equipamentos e manutenções por status."""
+
+    @abstractmethod
+    async def manutencoes_em_aberto(
+        self,
+        organizacao_id: str,
+        prevista_desde: Optional[datetime] = None,
+        prevista_antes: Optional[datetime] = None,
+        limite: int = 100
+    ):
+        """Manutenções não concluídas com data_prevista em [desde, antes)."""
+
+
+def _no_periodo(valor, inicio, fim):
+    valor = parse_data(valor)
+    if valor is None:
+        return inicio is None and fim is None
+    if inicio is not None and valor < inicio.replace(tzinfo=None):
+        return False
+    if fim is not None and valor > fim.replace(tzinfo=None):
+        return False
+    return True
+
+
+class MemoriaRepositorio(Repositorio):
+    """Mantém tudo em dicionários do processo; para testes e benchmarks."""
+
+    def __init__(self):
+        self.usuarios = {}
+        self.equipamentos = []
+        self.manutencoes = []
+
+    async def ping(self):
+        return True
+
+    async def buscar_usuario(self, username: str):
+        usuario = self.usuarios.get(username)
+        return copy.deepcopy(usuario) if usuario else None
+
+    async def criar_usuario(self, usuario: dict):
+        if usuario["username"] in self.usuarios:
+            raise ValueError(f"Usuário {usuario['username']} já existe")
+        self.usuarios[usuario["username"]] = copy.deepcopy(usuario)
+
+    async def listar_equipamentos(self, organizacao_id: str, limite: int = 1000):
+        return [
+            copy.deepcopy(e) for e in self.equipamentos
+            if e["organizacao_id"] == organizacao_id
+        ][:limite]
+
+    async def criar_equipamento(self, equipamento: dict):
+        self.equipamentos.append(copy.deepcopy(equipamento))
+        return equipamento
+
+    async def listar_manutencoes(
+        self,
+        organizacao_id: str,
+        equipamento_id: Optional[str] = None,
+        data_inicio: Optional[datetime] = None,
+        data_fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+        limite: int = 1000
+    ):
+        return [
+            copy.deepcopy(m) for m in self.manutencoes
+            if m["organizacao_id"] == organizacao_id
+            and (equipamento_id is None or m.get("equipamento_id") == equipamento_id)
+            and _no_periodo(m.get("created_at"), data_inicio, data_fim)
+        ][:limite]
+
+    async def criar_manutencao(self, manutencao: dict):
+        self.manutencoes.append(copy.deepcopy(manutencao))
+        return manutencao
+
+    async def resumo(self, organizacao_id: str):
+        status = [m.get("status") for m in self.manutencoes if m["organizacao_id"] == organizacao_id]
+        return {
+            "equipamentos": sum(1 for e in self.equipamentos if e["organizacao_id"] == organizacao_id),
+            "manutencoes": len(status),
+            "pendentes": status.count("pendente"),
+            "concluidas": status.count("concluida"),
+        }
+
+    async def manutencoes_em_aberto(
+        self,
+        organizacao_id: str,
+        prevista_desde: Optional[datetime] = None,
+        prevista_antes: Optional[datetime] = None,
+        limite: int = 100
+    ):
+        abertas = []
+        for manutencao in self.manutencoes:
+            if manutencao["organizacao_id"] != organizacao_id or manutencao.get("status") == "concluida":
+                continue
+            prevista = parse_data(manutencao.get("data_prevista"))
+            if prevista is None:
+                continue
+            if prevista_desde is not None and prevista < prevista_desde:
+                continue
+            if prevista_antes is not None and prevista >= prevista_antes:
+                continue
+            abertas.append(copy.deepcopy(manutencao))
+            if len(abertas) >= limite:
+                break
+        return abertas
+
+
+def _json_padrao(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _serializar(doc: dict):
+    return json.dumps(doc, default=_json_padrao, ensure_ascii=False)
+
+
+class SQLRepositorio(Repositorio):
+    """Armazena os dados em um banco relacional via SQLAlchemy assíncrono.
+
+    Os campos usados em filtros e agregações viram colunas indexadas; o
+    documento completo fica em uma coluna JSON (dados), preservando campos
+    livres enviados pelo frontend. URLs aceitas: postgresql+asyncpg://...
+    ou sqlite+aiosqlite:///arquivo.db.
+    """
+
+    def __init__(self, url: str):
+        try:
+            from sqlalchemy import (
+                JSON, Column, DateTime, Index, MetaData, String, Table
+            )
+            from sqlalchemy.ext.asyncio import create_async_engine
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=sql requer o pacote sqlalchemy[asyncio]")
+        if not url:
+            raise RuntimeError("STORAGE_BACKEND=sql requer SQLALCHEMY_URL")
+        # O driver assíncrono (asyncpg, aiosqlite) é carregado pelo próprio engine
+        self.engine = create_async_engine(url, json_serializer=_serializar)
+        self.metadata = MetaData()
+        self.usuarios = Table(
+            "usuarios", self.metadata,
+            Column("id", String(36), primary_key=True),
+            Column("username", String(150), nullable=False, unique=True),
+            Column("organizacao_id", String(100), nullable=False),
+            Column("dados", JSON, nullable=False),
+        )
+        # organizacao_id lidera os índices compostos, como no MongoDB
+        self.equipamentos = Table(
+            "equipamentos", self.metadata,
+            Column("id", String(36), primary_key=True),
+            Column("organizacao_id", String(100), nullable=False),
+            Column("created_at", DateTime, nullable=False),
+            Column("dados", JSON, nullable=False),
+            Index("ix_equipamentos_org_created", "organizacao_id", "created_at"),
+        )
+        self.manutencoes = Table(
+            "manutencoes", self.metadata,
+            Column("id", String(36), primary_key=True),
+            Column("organizacao_id", String(100), nullable=False),
+            Column("equipamento_id", String(36)),
+            Column("status", String(30)),
+            Column("data_prevista", DateTime),
+            Column("created_at", DateTime, nullable=False),
+            Column("dados", JSON, nullable=False),
+            Index("ix_manutencoes_org_status_prevista", "organizacao_id", "status", "data_prevista"),
+            Index("ix_manutencoes_org_equipamento", "organizacao_id", "equipamento_id"),
+            Index("ix_manutencoes_org_created", "organizacao_id", "created_at"),
+        )
+
+    async def iniciar(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(self.metadata.create_all)
+
+    async def fechar(self):
+        await self.engine.dispose()
+
+    async def ping(self):
+        from sqlalchemy import text
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+
+    async def buscar_usuario(self, username: str):
+        from sqlalchemy import select
+        async with self.engine.connect() as conn:
+            resultado = await conn.execute(
+                select(self.usuarios.c.dados).where(self.usuarios.c.username == username)
+            )
+            return resultado.scalar_one_or_none()
+
+    async def criar_usuario(self, usuario: dict):
+        async with self.engine.begin() as conn:
+            await conn.execute(self.usuarios.insert().values(
+                id=usuario["id"],
+                username=usuario["username"],
+                organizacao_id=usuario["organizacao_id"],
+                dados=usuario,
+            ))
+
+    async def listar_equipamentos(self, organizacao_id: str, limite: int = 1000):
+        from sqlalchemy import select
+        consulta = (
+            select(self.equipamentos.c.dados)
+            .where(self.equipamentos.c.organizacao_id == organizacao_id)
+            .limit(limite)
+        )
+        async with self.engine.connect() as conn:
+            return list((await conn.execute(consulta)).scalars())
+
+    async def criar_equipamento(self, equipamento: dict):
+        async with self.engine.begin() as conn:
+            await conn.execute(self.equipamentos.insert().values(
+                id=equipamento["id"],
+                organizacao_id=equipamento["organizacao_id"],
+                created_at=equipamento["created_at"],
+                dados=equipamento,
+            ))
+        return equipamento
+
+    async def listar_manutencoes(
+        self,
+        organizacao_id: str,
+        equipamento_id: Optional[str] = None,
+        data_inicio: Optional[datetime] = None,
+        data_fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+        limite: int = 1000
+    ):
+        # Sem coleções de arquivo: incluir_arquivo não altera o resultado
+        from sqlalchemy import select
+        tabela = self.manutencoes
+        consulta = select(tabela.c.dados).where(tabela.c.organizacao_id == organizacao_id)
+        if equipamento_id is not None:
+            consulta = consulta.where(tabela.c.equipamento_id == equipamento_id)
+        if data_inicio is not None:
+            consulta = consulta.where(tabela.c.created_at >= data_inicio.replace(tzinfo=None))
+        if data_fim is not None:
+            consulta = consulta.where(tabela.c.created_at <= data_fim.replace(tzinfo=None))
+        async with self.engine.connect() as conn:
+            return list((await conn.execute(consulta.limit(limite))).scalars())
+
+    async def criar_manutencao(self, manutencao: dict):
+        async with self.engine.begin() as conn:
+            await conn.execute(self.manutencoes.insert().values(
+                id=manutencao["id"],
+                organizacao_id=manutencao["organizacao_id"],
+                equipamento_id=manutencao.get("equipamento_id"),
+                status=manutencao.get("status"),
+                data_prevista=parse_data(manutencao.get("data_prevista")),
+                created_at=manutencao["created_at"],
+                dados=manutencao,
+            ))
+        return manutencao
+
+    async def resumo(self, organizacao_id: str):
+        # Contagens calculadas no banco: um COUNT e um GROUP BY status
+        from sqlalchemy import func, select
+        tabela = self.manutencoes
+        async with self.engine.connect() as conn:
+            equipamentos = (await conn.execute(
+                select(func.count())
+                .select_from(self.equipamentos)
+                .where(self.equipamentos.c.organizacao_id == organizacao_id)
+            )).scalar_one()
+            por_status = dict((await conn.execute(
+                select(tabela.c.status, func.count())
+                .where(tabela.c.organizacao_id == organizacao_id)
+                .group_by(tabela.c.status)
+            )).all())
+        return {
+            "equipamentos": equipamentos,
+            "manutencoes": sum(por_status.values()),
+            "pendentes": por_status.get("pendente", 0),
+            "concluidas": por_status.get("concluida", 0),
+        }
+
+    async def manutencoes_em_aberto(
+        self,
+        organizacao_id: str,
+        prevista_desde: Optional[datetime] = None,
+        prevista_antes: Optional[datetime] = None,
+        limite: int = 100
+    ):
+        from sqlalchemy import or_, select
+        tabela = self.manutencoes
+        consulta = select(tabela.c.dados).where(
+            tabela.c.organizacao_id == organizacao_id,
+            or_(tabela.c.status.is_(None), tabela.c.status != "concluida"),
+            tabela.c.data_prevista.is_not(None),
+        )
+        if prevista_desde is not None:
+            consulta = consulta.where(tabela.c.data_prevista >= prevista_desde)
+        if prevista_antes is not None:
+            consulta = consulta.where(tabela.c.data_prevista < prevista_antes)
+        async with self.engine.connect() as conn:
+            return list((await conn.execute(consulta.limit(limite))).scalars())
+
+
+def criar_repositorio(backend: str, url: Optional[str] = None):
+    """Cria os backends que não dependem do MongoDB (sql, memory)."""
+    if backend == "sql":
+        return SQLRepositorio(url)
+    if backend == "memory":
+        return MemoriaRepositorio()
+    raise RuntimeError(f"STORAGE_BACKEND desconhecido: {backend}")
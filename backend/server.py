@@ -1,40 +1,170 @@
 import sys
 import os
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
+import re
+import asyncio
+import atexit
+import contextvars
+import time
+from fastapi import FastAPI, Depends, HTTPException, status, APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+import fastapi.routing
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+from typing import List, Optional
 from pydantic import BaseModel
 import uuid
-import uvicorn
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
+from rastreamento import SamplingProfiler, exportar_spans_loop, registrar_span, span
+from repositorios import Repositorio, criar_repositorio, parse_data
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Configuração de logging
-logging.basicConfig(level=logging.INFO)
+# Logs estruturados em JSON. Os handlers apenas enfileiram o registro; a
+# escrita no stdout acontece na thread do QueueListener, fora do event loop
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+# Limites para o log de operações lentas
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# Rastreamento (spans no formato OpenTelemetry) e profiling sob demanda
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", str(ROOT_DIR / "traces.jsonl"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_EXPORT_INTERVAL_S = float(os.getenv("TRACE_EXPORT_INTERVAL_S", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(ROOT_DIR / "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_ARQUIVOS = int(os.getenv("PROFILE_MAX_ARQUIVOS", "200"))
+
+# Identificador de correlação da requisição atual, anexado a todo registro
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+def configurar_logging():
+    import logging.handlers
+    import queue
+
+    formatter = None
+    if LOG_FORMAT == "json":
+        try:
+            from pythonjsonlogger import jsonlogger
+            formatter = jsonlogger.JsonFormatter(
+                "%(asctime)s %(levelname)s %(name)s %(request_id)s %(message)s",
+                rename_fields={"asctime": "timestamp", "levelname": "level"},
+                json_ensure_ascii=False
+            )
+        except ImportError:
+            pass
+    if formatter is None:
+        formatter = logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        )
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    fila = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(fila)
+    # O filtro roda no contexto de quem loga, antes de o registro ir para a fila
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    # Os loggers do uvicorn passam a usar a mesma fila
+    for nome in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(nome).handlers = []
+        logging.getLogger(nome).propagate = True
+
+    listener = logging.handlers.QueueListener(fila, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = configurar_logging()
 logger = logging.getLogger(__name__)
 
 # Configurações de segurança
-SECRET_KEY = os.getenv("SECRET_KEY", "sua_chave_secreta_para_jwt_equipamentos_medicos_2024")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 horas
+# Tokens assinados com RS256 a partir das chaves privadas em JWT_KEYS_DIR;
+# JWT_ACTIVE_KID escolhe a chave usada para assinar novos tokens
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+# Sem chaves em JWT_KEYS_DIR o servidor não inicia: uma chave gerada por processo
+# desloga todos a cada reinício e faz as réplicas rejeitarem os tokens umas das
+# outras. Apenas para desenvolvimento local, JWT_EPHEMERAL_KEYS=true aceita isso
+JWT_EPHEMERAL_KEYS = os.getenv("JWT_EPHEMERAL_KEYS", "false").lower() == "true"
+ALGORITHM = "RS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Redis opcional para propagar revogações entre réplicas
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Configurações de multi-tenancy (organização/hospital)
+DEFAULT_ORGANIZACAO = os.getenv("DEFAULT_ORGANIZACAO", "default")
+# "shared": coleções únicas particionadas por organizacao_id
+# "database": um banco de dados por organização no mesmo cluster
+TENANT_MODE = os.getenv("TENANT_MODE", "shared")
+
+# Backend de armazenamento: "mongo" (padrão, todos os recursos), "sql"
+# (PostgreSQL/SQLite via SQLAlchemy assíncrono, para tenants com muitos
+# relatórios) ou "memory" (testes e benchmarks)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+SQLALCHEMY_URL = os.getenv("SQLALCHEMY_URL")
+# Migrações e backfills em segundo plano após a inicialização; com "false",
+# rodar manualmente com "python server.py migrar"
+DB_MIGRATIONS_ON_STARTUP = os.getenv("DB_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+# Arquivamento de manutenções concluídas em coleções por ano
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))  # 0 desativa o job
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Armazenamento de anexos dos equipamentos: "local" (ANEXOS_DIR) ou "s3"
+ANEXOS_BACKEND = os.getenv("ANEXOS_BACKEND", "local")
+ANEXOS_DIR = os.getenv("ANEXOS_DIR", str(ROOT_DIR / "anexos"))
+ANEXOS_S3_BUCKET = os.getenv("ANEXOS_S3_BUCKET")
+ANEXOS_S3_ENDPOINT_URL = os.getenv("ANEXOS_S3_ENDPOINT_URL")
+ANEXOS_MAX_MB = int(os.getenv("ANEXOS_MAX_MB", "100"))
 
 # Modelos para autenticação
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[str] = None
+    role: Optional[str] = None
+    organizacao_id: Optional[str] = None
+    jti: Optional[str] = None
+    exp: Optional[float] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# Modelos para sincronização incremental
+class SyncChange(BaseModel):
+    colecao: str
+    id: str
+    op: str = "upsert"  # upsert | delete
+    base_seq: Optional[int] = None  # sync_seq conhecido pelo cliente
+    data: Optional[dict] = None
+
+class SyncUpload(BaseModel):
+    changes: List[SyncChange]
 
 class User(BaseModel):
     username: str
@@ -44,11 +174,84 @@ class UserInDB(User):
     hashed_password: str
 
 # Configuração de criptografia de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib/bcrypt só são importados no primeiro uso para não pesar no startup
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+def conectar_mongo():
+    global client, db
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[criar_mongo_listener()])
+    db = client[DB_NAME]
+
+# Ciclo de vida: o cliente MongoDB é criado na inicialização do servidor,
+# e não na importação do módulo. Nada aqui espera pelo banco: o cliente
+# conecta sob demanda e migrações rodam em segundo plano
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global repositorio
+    # Falha na inicialização, e não no primeiro login, se faltarem as chaves JWT
+    get_key_set()
+    if STORAGE_BACKEND == "mongo":
+        conectar_mongo()
+        repositorio = MongoRepositorio()
+    else:
+        repositorio = criar_repositorio(STORAGE_BACKEND, SQLALCHEMY_URL)
+    await repositorio.iniciar()
+    await start_revocation_sync()
+    archive_job = None
+    if STORAGE_BACKEND == "mongo" and ARCHIVE_INTERVAL_HOURS > 0:
+        archive_job = asyncio.create_task(archive_loop())
+    trace_exporter = None
+    if TRACE_EXPORTER in ("file", "otlp"):
+        trace_exporter = asyncio.create_task(exportar_spans_loop(
+            TRACE_EXPORTER,
+            TRACE_FILE if TRACE_EXPORTER == "file" else TRACE_OTLP_ENDPOINT,
+            TRACE_EXPORT_INTERVAL_S,
+            "api-equipamentos-medicos",
+            logger
+        ))
+    yield
+    if archive_job is not None:
+        archive_job.cancel()
+    if trace_exporter is not None:
+        trace_exporter.cancel()
+        # Aguarda a exportação final dos spans pendentes
+        await asyncio.gather(trace_exporter, return_exceptions=True)
+    await stop_revocation_sync()
+    await repositorio.fechar()
+    if client is not None:
+        client.close()
+
+class JSONResponseRastreada(JSONResponse):
+    # Span do json.dumps de cada resposta
+    def render(self, content):
+        with span("serializacao.json"):
+            return super().render(content)
+
+# Antes do render, o FastAPI converte o retorno do endpoint com jsonable_encoder
+# (validando o response_model, quando houver) em serialize_response; esse passo
+# ganha o span serializacao.encoder. O handler das rotas busca a função no módulo
+# fastapi.routing a cada requisição, por isso ela é substituída ali
+_serialize_response = fastapi.routing.serialize_response
+
+async def serialize_response_rastreada(**kwargs):
+    with span("serializacao.encoder"):
+        return await _serialize_response(**kwargs)
+
+fastapi.routing.serialize_response = serialize_response_rastreada
+
 # Inicialização da aplicação FastAPI
-app = FastAPI(title="API de Gestão de Equipamentos Médicos", version="1.2")
+app = FastAPI(
+    title="API de Gestão de Equipamentos Médicos",
+    version="1.2",
+    lifespan=lifespan,
+    default_response_class=JSONResponseRastreada
+)
 
 # Configuração CORS
 app.add_middleware(
@@ -57,68 +260,708 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
-# Conexão com MongoDB
+def profiling_solicitado(scope):
+    # Profiling sob demanda: cabeçalho X-Profile: 1 ou ?profile=1, apenas
+    # para administradores (verificado pelas claims do token, sem banco)
+    from urllib.parse import parse_qs
+    headers = dict(scope["headers"])
+    flag = headers.get(b"x-profile", b"").decode("latin-1")
+    if flag != "1" and parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile") != ["1"]:
+        return False
+    autorizacao = headers.get(b"authorization", b"").decode("latin-1")
+    if not autorizacao.lower().startswith("bearer "):
+        return False
+    token_data = decode_access_token(autorizacao[7:])
+    return token_data is not None and token_data.role == "admin"
+
+def salvar_profile(profile_id: str, conteudo: str):
+    diretorio = Path(PROFILE_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    (diretorio / f"{profile_id}.folded").write_text(conteudo, encoding="utf-8")
+    # Mantém apenas os PROFILE_MAX_ARQUIVOS mais recentes
+    arquivos = []
+    for caminho in diretorio.glob("*.folded"):
+        try:
+            arquivos.append((caminho.stat().st_mtime, caminho))
+        except FileNotFoundError:
+            continue
+    arquivos.sort(reverse=True)
+    for _, caminho in arquivos[PROFILE_MAX_ARQUIVOS:]:
+        caminho.unlink(missing_ok=True)
+
+class RequestContextMiddleware:
+    """Define o request id da requisição, abre o span raiz e registra a duração.
+
+    Middleware ASGI puro (sem BaseHTTPMiddleware), para não interferir em
+    respostas em streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for nome, valor in scope["headers"]:
+            if nome == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        inicio = time.perf_counter()
+        status_code = 500
+
+        profiler = None
+        profile_id = None
+        if profiling_solicitado(scope):
+            import threading
+            profile_id = uuid.uuid4().hex
+            profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+            profiler.start()
+
+        async def send_com_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                extras = [(b"x-request-id", request_id.encode("latin-1"))]
+                if profile_id:
+                    extras.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message["headers"] = list(message.get("headers", [])) + extras
+            await send(message)
+
+        try:
+            with span(
+                f"{scope['method']} {scope['path']}",
+                request_id=request_id,
+                http_method=scope["method"],
+                http_path=scope["path"]
+            ) as span_raiz:
+                await self.app(scope, receive, send_com_request_id)
+                span_raiz.atributos["http_status_code"] = status_code
+        finally:
+            if profiler is not None:
+                # stop() espera a thread de amostragem; fora do event loop
+                await asyncio.to_thread(profiler.stop)
+                try:
+                    await asyncio.to_thread(salvar_profile, profile_id, profiler.folded())
+                except Exception as e:
+                    logger.error("Erro ao salvar profile %s: %s", profile_id, e)
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            lenta = duracao_ms >= SLOW_REQUEST_MS
+            logger.log(
+                logging.WARNING if lenta else logging.INFO,
+                "Requisição lenta" if lenta else "Requisição concluída",
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "duracao_ms": round(duracao_ms, 2),
+                }
+            )
+            request_id_var.reset(token)
+
+# Adicionado por último para envolver todos os outros middlewares
+app.add_middleware(RequestContextMiddleware)
+
+def criar_mongo_listener():
+    # Monitoramento de comandos do driver. O Motor executa o pymongo em threads
+    # copiando o contexto, então o request id da requisição chega até aqui
+    from pymongo import monitoring
+
+    class MongoCommandListener(monitoring.CommandListener):
+        def __init__(self):
+            self._colecoes = {}
+
+        def started(self, event):
+            colecao = event.command.get(event.command_name)
+            if isinstance(colecao, str):
+                self._colecoes[event.request_id] = colecao
+
+        def succeeded(self, event):
+            colecao = self._colecoes.pop(event.request_id, None)
+            registrar_span(
+                f"mongo.{event.command_name}",
+                event.duration_micros * 1000,
+                db_system="mongodb",
+                db_name=event.database_name,
+                db_collection=colecao or ""
+            )
+            duracao_ms = event.duration_micros / 1000
+            if duracao_ms >= SLOW_QUERY_MS:
+                logger.warning("Operação MongoDB lenta", extra={
+                    "mongo_command": event.command_name,
+                    "mongo_database": event.database_name,
+                    "mongo_collection": colecao,
+                    "duracao_ms": round(duracao_ms, 2),
+                })
+
+        def failed(self, event):
+            colecao = self._colecoes.pop(event.request_id, None)
+            registrar_span(
+                f"mongo.{event.command_name}",
+                event.duration_micros * 1000,
+                db_system="mongodb",
+                db_name=event.database_name,
+                db_collection=colecao or "",
+                error=True
+            )
+            logger.warning("Operação MongoDB falhou", extra={
+                "mongo_command": event.command_name,
+                "mongo_database": event.database_name,
+                "mongo_collection": colecao,
+                "duracao_ms": round(event.duration_micros / 1000, 2),
+                "erro": str(event.failure),
+            })
+
+    return MongoCommandListener()
+
+# Conexão com MongoDB (inicializada em lifespan)
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'equipamentos_db')]
+DB_NAME = os.environ.get('DB_NAME', 'equipamentos_db')
+client = None
+db = None
+# Repositório usado pelos handlers (definido em lifespan conforme STORAGE_BACKEND)
+repositorio: Optional[Repositorio] = None
+
+# Bancos de organizações cujos índices já foram garantidos neste processo
+_tenant_dbs_indexados = set()
+
+async def criar_indices_tenant(tenant_db):
+    # organizacao_id lidera todos os índices compostos para que cada consulta
+    # percorra apenas os documentos de uma organização
+    await tenant_db.equipamentos.create_index(
+        [("organizacao_id", 1), ("id", 1)], unique=True
+    )
+    await tenant_db.equipamentos.create_index(
+        [("organizacao_id", 1), ("created_at", -1)]
+    )
+    await tenant_db.manutencoes.create_index(
+        [("organizacao_id", 1), ("id", 1)], unique=True
+    )
+    await tenant_db.manutencoes.create_index(
+        [("organizacao_id", 1), ("status", 1), ("data_prevista", 1)]
+    )
+    await tenant_db.manutencoes.create_index(
+        [("organizacao_id", 1), ("equipamento_id", 1)]
+    )
+    # Varredura do job de arquivamento (concluídas mais antigas primeiro)
+    await tenant_db.manutencoes.create_index(
+        [("organizacao_id", 1), ("status", 1), ("updated_at", 1)]
+    )
+    # Delta-sync: leitura incremental por sequência dentro da organização
+    for colecao in (tenant_db.equipamentos, tenant_db.manutencoes, tenant_db.sync_tombstones):
+        await colecao.create_index([("organizacao_id", 1), ("sync_seq", 1)])
+    await tenant_db.anexos.create_index([("organizacao_id", 1), ("id", 1)], unique=True)
+    await tenant_db.anexos.create_index([("organizacao_id", 1), ("equipamento_id", 1)])
+    await tenant_db.anexos.create_index([("organizacao_id", 1), ("sha256", 1)])
+    # Estatísticas de confiabilidade: uma linha por entidade
+    await tenant_db.confiabilidade_stats.create_index(
+        [("organizacao_id", 1), ("tipo_entidade", 1), ("chave", 1)], unique=True
+    )
+
+# Reservas de sync_seq sem liberação (réplica caiu no meio da escrita)
+# deixam de segurar o cursor depois deste prazo
+SYNC_RESERVA_TIMEOUT = timedelta(seconds=60)
+
+@asynccontextmanager
+async def reservar_sync_seq(tenant_db, organizacao_id: str, quantidade: int = 1):
+    """Reserva sync_seq no contador monotônico da organização.
+
+    Retorna o último valor reservado. Enquanto a escrita não termina, a
+    reserva fica registrada no próprio documento do contador (no mesmo $inc),
+    e o GET /sync não entrega cursores a partir dela: uma escrita com seq
+    maior que termine antes não faz o cliente pular a menor.
+    """
+    from pymongo import ReturnDocument
+    atual = await tenant_db.sync_counters.find_one({"_id": organizacao_id}, {"seq": 1})
+    reserva = {
+        "id": str(uuid.uuid4()),
+        # Limite inferior: o contador só cresce, então o seq reservado é maior
+        "minimo": (atual or {}).get("seq", 0) + 1,
+        "expira_em": datetime.utcnow() + SYNC_RESERVA_TIMEOUT
+    }
+    contador = await tenant_db.sync_counters.find_one_and_update(
+        {"_id": organizacao_id},
+        {"$inc": {"seq": quantidade}, "$push": {"pendentes": reserva}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    try:
+        yield contador["seq"]
+    finally:
+        await tenant_db.sync_counters.update_one(
+            {"_id": organizacao_id}, {"$pull": {"pendentes": {"id": reserva["id"]}}}
+        )
+        agora = datetime.utcnow()
+        if any(p["expira_em"] < agora for p in contador.get("pendentes", [])):
+            await tenant_db.sync_counters.update_one(
+                {"_id": organizacao_id}, {"$pull": {"pendentes": {"expira_em": {"$lt": agora}}}}
+            )
+
+async def sync_watermark(tenant_db, organizacao_id: str):
+    # Maior seq abaixo do qual todas as escritas já terminaram
+    contador = await tenant_db.sync_counters.find_one({"_id": organizacao_id}) or {}
+    agora = datetime.utcnow()
+    limite = contador.get("seq", 0)
+    for reserva in contador.get("pendentes", []):
+        if reserva["expira_em"] > agora:
+            limite = min(limite, reserva["minimo"] - 1)
+    return limite
+
+async def backfill_sync_seq(tenant_db):
+    # Documentos anteriores ao delta-sync recebem um sync_seq uma única vez
+    from pymongo import UpdateOne
+    for colecao in (tenant_db.equipamentos, tenant_db.manutencoes):
+        pendentes = await colecao.find(
+            {"sync_seq": {"$exists": False}},
+            {"_id": 1, "organizacao_id": 1}
+        ).to_list(None)
+        por_organizacao = {}
+        for doc in pendentes:
+            organizacao_id = doc.get("organizacao_id", DEFAULT_ORGANIZACAO)
+            por_organizacao.setdefault(organizacao_id, []).append(doc["_id"])
+        for organizacao_id, ids in por_organizacao.items():
+            async with reservar_sync_seq(tenant_db, organizacao_id, len(ids)) as ultimo:
+                primeiro = ultimo - len(ids) + 1
+                operacoes = [
+                    UpdateOne({"_id": _id}, {"$set": {"sync_seq": primeiro + i}})
+                    for i, _id in enumerate(ids)
+                ]
+                for inicio in range(0, len(operacoes), 1000):
+                    await colecao.bulk_write(operacoes[inicio:inicio + 1000], ordered=False)
+
+# Nomes de banco do MongoDB não aceitam /\. "$*<>:|? e têm no máximo 63 bytes
+ORGANIZACAO_ID_BANCO = re.compile(r"[A-Za-z0-9_-]+")
+
+def nome_banco_organizacao(organizacao_id: str):
+    nome = f"{DB_NAME}_{organizacao_id}"
+    if not ORGANIZACAO_ID_BANCO.fullmatch(organizacao_id or "") or len(nome.encode("utf-8")) > 63:
+        raise ValueError(f"organizacao_id inválido para TENANT_MODE=database: {organizacao_id!r}")
+    return nome
+
+async def get_tenant_db(organizacao_id: str):
+    if TENANT_MODE == "database":
+        tenant_db = client[nome_banco_organizacao(organizacao_id)]
+    else:
+        tenant_db = db
+    if tenant_db.name not in _tenant_dbs_indexados:
+        await criar_indices_tenant(tenant_db)
+        _tenant_dbs_indexados.add(tenant_db.name)
+    return tenant_db
+
+def tenant_filter(current_user, query: Optional[dict] = None):
+    filtro = {"organizacao_id": current_user["organizacao_id"]}
+    if query:
+        filtro.update(query)
+    return filtro
+
+class MongoRepositorio(Repositorio):
+    """Repositório sobre o MongoDB: tenants, delta-sync, arquivo e confiabilidade."""
+
+    def __init__(self):
+        self._preparacao = None
+
+    async def iniciar(self):
+        if DB_MIGRATIONS_ON_STARTUP:
+            self._preparacao = asyncio.create_task(preparar_banco_em_segundo_plano())
+
+    async def fechar(self):
+        if self._preparacao is not None:
+            self._preparacao.cancel()
+            await asyncio.gather(self._preparacao, return_exceptions=True)
+
+    async def ping(self):
+        await client.admin.command('ping')
+        return True
+
+    async def buscar_usuario(self, username: str):
+        return await db.users.find_one({"username": username}, {"_id": 0})
+
+    async def criar_usuario(self, usuario: dict):
+        await db.users.insert_one(dict(usuario))
+
+    async def listar_equipamentos(self, organizacao_id: str, limite: int = 1000):
+        tenant_db = await get_tenant_db(organizacao_id)
+        return await tenant_db.equipamentos.find(
+            {"organizacao_id": organizacao_id}, {"_id": 0}
+        ).to_list(limite)
+
+    async def criar_equipamento(self, equipamento: dict):
+        tenant_db = await get_tenant_db(equipamento["organizacao_id"])
+        async with reservar_sync_seq(tenant_db, equipamento["organizacao_id"]) as seq:
+            equipamento["sync_seq"] = seq
+            await tenant_db.equipamentos.insert_one(dict(equipamento))
+        return equipamento
+
+    async def listar_manutencoes(
+        self,
+        organizacao_id: str,
+        equipamento_id: Optional[str] = None,
+        data_inicio: Optional[datetime] = None,
+        data_fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+        limite: int = 1000
+    ):
+        tenant_db = await get_tenant_db(organizacao_id)
+        filtro = {"organizacao_id": organizacao_id}
+        if equipamento_id is not None:
+            filtro["equipamento_id"] = equipamento_id
+        return await buscar_manutencoes(
+            tenant_db,
+            filtro,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            incluir_arquivo=incluir_arquivo,
+            limite=limite
+        )
+
+    async def criar_manutencao(self, manutencao: dict):
+        tenant_db = await get_tenant_db(manutencao["organizacao_id"])
+        async with reservar_sync_seq(tenant_db, manutencao["organizacao_id"]) as seq:
+            manutencao["sync_seq"] = seq
+            await tenant_db.manutencoes.insert_one(dict(manutencao))
+        await atualizar_confiabilidade(tenant_db, manutencao)
+        return manutencao
+
+    async def resumo(self, organizacao_id: str):
+        tenant_db = await get_tenant_db(organizacao_id)
+        filtro = {"organizacao_id": organizacao_id}
+        (
+            total_equipamentos,
+            total_manutencoes,
+            manutencoes_pendentes,
+            manutencoes_concluidas,
+            resumo_arquivo
+        ) = await asyncio.gather(
+            tenant_db.equipamentos.count_documents(filtro),
+            tenant_db.manutencoes.count_documents(filtro),
+            tenant_db.manutencoes.count_documents({**filtro, "status": "pendente"}),
+            tenant_db.manutencoes.count_documents({**filtro, "status": "concluida"}),
+            # Manutenções arquivadas são sempre concluídas; o total vem do resumo
+            tenant_db.arquivo_resumo.find_one({"_id": organizacao_id})
+        )
+        arquivadas = (resumo_arquivo or {}).get("total", 0)
+        return {
+            "equipamentos": total_equipamentos,
+            "manutencoes": total_manutencoes + arquivadas,
+            "pendentes": manutencoes_pendentes,
+            "concluidas": manutencoes_concluidas + arquivadas,
+        }
+
+    async def manutencoes_em_aberto(
+        self,
+        organizacao_id: str,
+        prevista_desde: Optional[datetime] = None,
+        prevista_antes: Optional[datetime] = None,
+        limite: int = 100
+    ):
+        tenant_db = await get_tenant_db(organizacao_id)
+        data_prevista = {}
+        if prevista_desde is not None:
+            data_prevista["$gte"] = prevista_desde
+        if prevista_antes is not None:
+            data_prevista["$lt"] = prevista_antes
+        filtro = {"organizacao_id": organizacao_id, "status": {"$ne": "concluida"}}
+        if data_prevista:
+            filtro["data_prevista"] = data_prevista
+        return await tenant_db.manutencoes.find(filtro, {"_id": 0}).to_list(limite)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Funções de autenticação
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+# Conjunto de chaves JWT: cada arquivo <kid>.pem em JWT_KEYS_DIR é uma chave
+# privada RSA. A chave ativa assina novos tokens; as demais continuam válidas
+# para verificação até saírem do diretório, permitindo rotação sem logout.
+@lru_cache(maxsize=None)
+def get_key_set():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk
+
+    chaves_privadas = {}
+    if JWT_KEYS_DIR:
+        for arquivo in sorted(Path(JWT_KEYS_DIR).glob("*.pem")):
+            chaves_privadas[arquivo.stem] = serialization.load_pem_private_key(
+                arquivo.read_bytes(), password=None
+            )
+    if not chaves_privadas:
+        if not JWT_EPHEMERAL_KEYS:
+            raise RuntimeError(
+                "Nenhuma chave RSA (<kid>.pem) em JWT_KEYS_DIR; gere uma chave ou, "
+                "apenas em desenvolvimento, defina JWT_EPHEMERAL_KEYS=true"
+            )
+        logger.warning(
+            "Nenhuma chave em JWT_KEYS_DIR; usando chave RSA efêmera "
+            "(tokens não serão aceitos por outras réplicas)"
+        )
+        chaves_privadas["efemera"] = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+
+    key_set = {"signing": {}, "verify": {}, "jwks": []}
+    for kid, private_key in chaves_privadas.items():
+        key_set["signing"][kid] = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode()
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        key_set["verify"][kid] = public_pem
+        public_jwk = jwk.construct(public_pem, ALGORITHM).to_dict()
+        public_jwk.update({"kid": kid, "use": "sig"})
+        key_set["jwks"].append(public_jwk)
+
+    # Sem JWT_ACTIVE_KID, assina com o último kid em ordem lexicográfica
+    # (ex.: kids nomeados por data, "2024-06", "2024-12")
+    if JWT_ACTIVE_KID in chaves_privadas:
+        key_set["active_kid"] = JWT_ACTIVE_KID
+    else:
+        key_set["active_kid"] = sorted(chaves_privadas)[-1]
+    return key_set
+
+class RevocationList:
+    """Lista de revogação em memória: jti -> expiração (timestamp).
+
+    A consulta é O(1); entradas expiradas são descartadas periodicamente,
+    já que o próprio token deixa de ser aceito após o exp.
+    """
+
+    def __init__(self):
+        self._revogados = {}
+        self._ultima_limpeza = 0.0
+
+    def __contains__(self, jti):
+        return jti in self._revogados
+
+    def __len__(self):
+        return len(self._revogados)
+
+    def add(self, jti: str, exp: float):
+        self._revogados[jti] = exp
+        agora = time.time()
+        if agora - self._ultima_limpeza > 60:
+            self._revogados = {
+                j: e for j, e in self._revogados.items() if e > agora
+            }
+            self._ultima_limpeza = agora
+
+revocation_list = RevocationList()
+
+# Sincronização da lista de revogação entre réplicas via Redis (opcional)
+REVOCATION_KEY = "jwt:revogados"
+REVOCATION_CHANNEL = "jwt:revogacoes"
+redis_client = None
+_revocation_listener = None
+
+async def start_revocation_sync():
+    global redis_client, _revocation_listener
+    if not REDIS_URL:
+        return
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        logger.warning("REDIS_URL definido mas o pacote redis não está instalado")
+        return
+    redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+    _revocation_listener = asyncio.create_task(escutar_revogacoes())
+
+async def carregar_revogacoes():
+    agora = time.time()
+    # O sorted set usa o exp como score, então expirados saem por intervalo
+    await redis_client.zremrangebyscore(REVOCATION_KEY, "-inf", agora)
+    for jti, exp in await redis_client.zrangebyscore(
+        REVOCATION_KEY, agora, "+inf", withscores=True
+    ):
+        revocation_list.add(jti, exp)
+
+async def escutar_revogacoes():
+    # Reconecta com backoff quando o Redis cai; a cada conexão o snapshot é
+    # recarregado para recuperar revogações publicadas enquanto estava fora
+    espera = 1
+    interrompida = False
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            # Assina antes de ler o snapshot para não perder nada no intervalo
+            await pubsub.subscribe(REVOCATION_CHANNEL)
+            await carregar_revogacoes()
+            if interrompida:
+                logger.info("Sincronização de revogações com o Redis restabelecida")
+            espera = 1
+            interrompida = False
+            async for mensagem in pubsub.listen():
+                if mensagem.get("type") != "message":
+                    continue
+                jti, _, exp = mensagem["data"].rpartition(":")
+                revocation_list.add(jti, float(exp))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(
+                "Sincronização de revogações com o Redis interrompida; nova tentativa em %ss: %s",
+                espera, e
+            )
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
+        interrompida = True
+        await asyncio.sleep(espera)
+        espera = min(espera * 2, 30)
+
+async def stop_revocation_sync():
+    if _revocation_listener is not None:
+        _revocation_listener.cancel()
+    if redis_client is not None:
+        await redis_client.close()
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+async def revoke_token(jti: str, exp: float):
+    revocation_list.add(jti, exp)
+    if redis_client is None:
+        return
+    try:
+        await redis_client.zadd(REVOCATION_KEY, {jti: exp})
+        await redis_client.publish(REVOCATION_CHANNEL, f"{jti}:{exp}")
+    except Exception as e:
+        logger.error("Erro ao propagar revogação via Redis: %s", e)
+
+def create_access_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    token_type: str = "access"
+):
+    from jose import jwt
     to_encode = data.copy()
+    agora = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = agora + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        expire = agora + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({
+        "exp": expire,
+        "iat": agora,
+        "jti": str(uuid.uuid4()),
+        "typ": token_type
+    })
+    key_set = get_key_set()
+    kid = key_set["active_kid"]
+    encoded_jwt = jwt.encode(
+        to_encode,
+        key_set["signing"][kid],
+        algorithm=ALGORITHM,
+        headers={"kid": kid}
+    )
     return encoded_jwt
 
-def decode_access_token(token: str):
+def create_refresh_token(data: dict):
+    return create_access_token(
+        data,
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        token_type="refresh"
+    )
+
+def decode_access_token(token: str, token_type: str = "access"):
+    from jose import JWTError, jwt
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = get_key_set()["verify"].get(kid)
+        if public_key is None:
+            return None
+        payload = jwt.decode(token, public_key, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("typ") != token_type:
+            return None
+        if payload.get("jti") in revocation_list:
             return None
-        token_data = TokenData(username=username)
+        token_data = TokenData(
+            username=username,
+            user_id=payload.get("uid"),
+            role=payload.get("role", "user"),
+            organizacao_id=payload.get("org", DEFAULT_ORGANIZACAO),
+            jti=payload.get("jti"),
+            exp=payload.get("exp")
+        )
         return token_data
     except JWTError:
         return None
 
+def issue_tokens(user: dict):
+    claims = {
+        "sub": user["username"],
+        "uid": user["id"],
+        "role": user.get("role", "user"),
+        "org": user.get("organizacao_id", DEFAULT_ORGANIZACAO)
+    }
+    return {
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token_data = decode_access_token(token)
+    with span("auth.get_current_user"):
+        token_data = decode_access_token(token)
     if token_data is None:
         raise credentials_exception
-    user = await db.users.find_one({"username": token_data.username})
-    if user is None:
-        raise credentials_exception
-    return user
+    # Verificação sem estado: o usuário é reconstruído a partir das claims
+    # assinadas, sem consultar db.users a cada requisição
+    return {
+        "id": token_data.user_id,
+        "username": token_data.username,
+        "role": token_data.role,
+        "organizacao_id": token_data.organizacao_id,
+        "disabled": False,
+        "jti": token_data.jti,
+        "exp": token_data.exp
+    }
 
 async def get_current_active_user(current_user=Depends(get_current_user)):
     if current_user.get("disabled"):
         raise HTTPException(status_code=400, detail="Usuário inativo")
     return current_user
 
+async def get_current_admin_user(current_user=Depends(get_current_active_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return current_user
+
+# Anexos, delta-sync, arquivamento e confiabilidade dependem de recursos do
+# MongoDB (contadores, coleções por ano, upserts) e não existem nos demais backends
+async def requer_mongo():
+    if STORAGE_BACKEND != "mongo":
+        raise HTTPException(
+            status_code=501,
+            detail="Recurso disponível apenas com STORAGE_BACKEND=mongo"
+        )
+
 # Endpoint de login
 @api_router.post("/login", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     # Verificar se o usuário existe
-    user = await db.users.find_one({"username": form_data.username})
+    user = await repositorio.buscar_usuario(form_data.username)
     
     # Se não existir e for o primeiro login com admin/admin, criar o usuário admin
     if not user and form_data.username == "admin" and form_data.password == "admin":
@@ -131,18 +974,15 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             "hashed_password": hashed_password,
             "disabled": False,
             "role": "admin",
+            "organizacao_id": DEFAULT_ORGANIZACAO,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
-        await db.users.insert_one(user)
+        await repositorio.criar_usuario(user)
         logger.info("Usuário admin criado com sucesso")
         
-        # Criar token de acesso
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user["username"]}, expires_delta=access_token_expires
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
+        # Criar tokens de acesso e de renovação
+        return issue_tokens(user)
     
     # Verificar credenciais para usuário existente
     if not user:
@@ -168,12 +1008,58 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
                 headers={"WWW-Authenticate": "Bearer"},
             )
     
-    # Criar token de acesso
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user["username"]}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Como o token não é mais conferido no banco, usuários inativos
+    # são barrados aqui e na renovação
+    if user.get("disabled"):
+        raise HTTPException(status_code=400, detail="Usuário inativo")
+    
+    # Criar tokens de acesso e de renovação
+    return issue_tokens(user)
+
+# Endpoint de renovação de token
+@api_router.post("/token/refresh", response_model=Token, tags=["Usuários"])
+async def refresh_access_token(body: RefreshRequest):
+    token_data = decode_access_token(body.refresh_token, token_type="refresh")
+    if token_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de renovação inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # A renovação é o único ponto que consulta o usuário no banco,
+    # no máximo uma vez por ACCESS_TOKEN_EXPIRE_MINUTES
+    user = await repositorio.buscar_usuario(token_data.username)
+    if (
+        user is None
+        or user.get("disabled")
+        or user.get("organizacao_id", DEFAULT_ORGANIZACAO) != token_data.organizacao_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de renovação inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Rotação: cada token de renovação só pode ser usado uma vez
+    await revoke_token(token_data.jti, token_data.exp)
+    return issue_tokens(user)
+
+# Endpoint de logout
+@api_router.post("/logout", tags=["Usuários"])
+async def logout(
+    body: Optional[RefreshRequest] = None,
+    current_user=Depends(get_current_active_user)
+):
+    await revoke_token(current_user["jti"], current_user["exp"])
+    if body is not None:
+        token_data = decode_access_token(body.refresh_token, token_type="refresh")
+        if token_data is not None and token_data.username == current_user["username"]:
+            await revoke_token(token_data.jti, token_data.exp)
+    return {"message": "Logout realizado com sucesso"}
+
+# Chaves públicas para verificação dos tokens (formato JWKS)
+@api_router.get("/.well-known/jwks.json", tags=["Sistema"])
+async def jwks():
+    return {"keys": get_key_set()["jwks"]}
 
 # Endpoint de informações do usuário atual
 @api_router.get("/me", tags=["Usuários"])
@@ -182,6 +1068,7 @@ async def read_users_me(current_user=Depends(get_current_active_user)):
         "id": current_user["id"],
         "username": current_user["username"],
         "role": current_user.get("role", "user"),
+        "organizacao_id": current_user["organizacao_id"],
         "disabled": current_user.get("disabled", False)
     }
 
@@ -189,33 +1076,36 @@ async def read_users_me(current_user=Depends(get_current_active_user)):
 @api_router.get("/health", tags=["Sistema"])
 async def health_check():
     try:
-        # Testar conexão com MongoDB
-        await client.admin.command('ping')
+        # Testar conexão com o banco configurado
+        await repositorio.ping()
         return {
             "status": "ok",
             "timestamp": datetime.utcnow().isoformat(),
-            "database": "connected"
+            "database": "connected",
+            "storage_backend": STORAGE_BACKEND
         }
     except Exception as e:
         return {
             "status": "error",
             "timestamp": datetime.utcnow().isoformat(),
             "database": "disconnected",
+            "storage_backend": STORAGE_BACKEND,
             "error": str(e)
         }
 
 # Endpoints para equipamentos
 @api_router.get("/equipamentos", tags=["Equipamentos"])
-async def listar_equipamentos(current_user=Depends(get_current_active_user)):
+async def listar_equipamentos(
+    limit: int = 1000,
+    current_user=Depends(get_current_active_user)
+):
     try:
-        equipamentos = await db.equipamentos.find().to_list(1000)
-        # Converter ObjectId para string se necessário
-        for equipamento in equipamentos:
-            if "_id" in equipamento:
-                del equipamento["_id"]
+        equipamentos = await repositorio.listar_equipamentos(
+            current_user["organizacao_id"], limite=max(1, min(limit, 1000))
+        )
         return {"equipamentos": equipamentos, "total": len(equipamentos)}
     except Exception as e:
-        logger.error(f"Erro ao listar equipamentos: {e}")
+        logger.error("Erro ao listar equipamentos: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @api_router.post("/equipamentos", tags=["Equipamentos"], status_code=201)
@@ -225,45 +1115,67 @@ async def criar_equipamento(equipamento: dict, current_user=Depends(get_current_
         equipamento["created_at"] = datetime.utcnow()
         equipamento["updated_at"] = datetime.utcnow()
         equipamento["created_by"] = current_user["username"]
-        await db.equipamentos.insert_one(equipamento)
-        
-        # Remover _id do MongoDB antes de retornar
-        if "_id" in equipamento:
-            del equipamento["_id"]
+        equipamento["organizacao_id"] = current_user["organizacao_id"]
+        await repositorio.criar_equipamento(equipamento)
         
         return {"message": "Equipamento criado com sucesso", "equipamento": equipamento}
     except Exception as e:
-        logger.error(f"Erro ao criar equipamento: {e}")
+        logger.error("Erro ao criar equipamento: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+# Datas de manutenção chegam do JSON como texto ISO; são convertidas uma vez,
+# antes do repositório, para que todos os backends gravem e filtrem datetime
+CAMPOS_DATA_MANUTENCAO = ("data_prevista", "data_falha", "data_conclusao")
+
+def normalizar_datas_manutencao(manutencao: dict):
+    for campo in CAMPOS_DATA_MANUTENCAO:
+        valor = manutencao.get(campo)
+        if isinstance(valor, str):
+            data = parse_data(valor)
+            if data is None and valor:
+                raise ValueError(f"Data inválida em {campo}: {valor!r}")
+            manutencao[campo] = data
+    return manutencao
+
 # Endpoints para manutenções
 @api_router.get("/manutencoes", tags=["Manutenções"])
-async def listar_manutencoes(current_user=Depends(get_current_active_user)):
+async def listar_manutencoes(
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    incluir_arquivo: bool = False,
+    limit: int = 1000,
+    current_user=Depends(get_current_active_user)
+):
     try:
-        manutencoes = await db.manutencoes.find().to_list(1000)
-        for manutencao in manutencoes:
-            if "_id" in manutencao:
-                del manutencao["_id"]
+        manutencoes = await repositorio.listar_manutencoes(
+            current_user["organizacao_id"],
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            incluir_arquivo=incluir_arquivo,
+            limite=max(1, min(limit, 1000))
+        )
         return {"manutencoes": manutencoes, "total": len(manutencoes)}
     except Exception as e:
-        logger.error(f"Erro ao listar manutenções: {e}")
+        logger.error("Erro ao listar manutenções: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @api_router.post("/manutencoes", tags=["Manutenções"], status_code=201)
 async def criar_manutencao(manutencao: dict, current_user=Depends(get_current_active_user)):
+    try:
+        normalizar_datas_manutencao(manutencao)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     try:
         manutencao["id"] = str(uuid.uuid4())
         manutencao["created_at"] = datetime.utcnow()
         manutencao["updated_at"] = datetime.utcnow()
         manutencao["created_by"] = current_user["username"]
-        await db.manutencoes.insert_one(manutencao)
-        
-        if "_id" in manutencao:
-            del manutencao["_id"]
+        manutencao["organizacao_id"] = current_user["organizacao_id"]
+        await repositorio.criar_manutencao(manutencao)
         
         return {"message": "Manutenção criada com sucesso", "manutencao": manutencao}
     except Exception as e:
-        logger.error(f"Erro ao criar manutenção: {e}")
+        logger.error("Erro ao criar manutenção: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 # Endpoints para relatórios
@@ -271,52 +1183,49 @@ async def criar_manutencao(manutencao: dict, current_user=Depends(get_current_ac
 async def listar_relatorios(current_user=Depends(get_current_active_user)):
     try:
         # Gerar relatório básico com estatísticas
-        total_equipamentos = await db.equipamentos.count_documents({})
-        total_manutencoes = await db.manutencoes.count_documents({})
-        manutencoes_pendentes = await db.manutencoes.count_documents({"status": "pendente"})
-        manutencoes_concluidas = await db.manutencoes.count_documents({"status": "concluida"})
+        resumo = await repositorio.resumo(current_user["organizacao_id"])
         
         return {
             "relatorio": {
                 "equipamentos": {
-                    "total": total_equipamentos
+                    "total": resumo["equipamentos"]
                 },
                 "manutencoes": {
-                    "total": total_manutencoes,
-                    "pendentes": manutencoes_pendentes,
-                    "concluidas": manutencoes_concluidas
+                    "total": resumo["manutencoes"],
+                    "pendentes": resumo["pendentes"],
+                    "concluidas": resumo["concluidas"]
                 },
                 "gerado_em": datetime.utcnow().isoformat(),
                 "gerado_por": current_user["username"]
             }
         }
     except Exception as e:
-        logger.error(f"Erro ao gerar relatório: {e}")
+        logger.error("Erro ao gerar relatório: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 # Endpoint para notificações
 @api_router.get("/notificacoes", tags=["Notificações"])
-async def listar_notificacoes(current_user=Depends(get_current_active_user)):
+async def listar_notificacoes(
+    limit: int = 100,
+    current_user=Depends(get_current_active_user)
+):
     try:
         # Buscar manutenções vencidas ou próximas do vencimento
         hoje = datetime.utcnow()
         proxima_semana = hoje + timedelta(days=7)
+        limit = max(1, min(limit, 100))
+        organizacao_id = current_user["organizacao_id"]
         
-        manutencoes_vencidas = await db.manutencoes.find({
-            "data_prevista": {"$lt": hoje},
-            "status": {"$ne": "concluida"}
-        }).to_list(100)
-        
-        manutencoes_proximas = await db.manutencoes.find({
-            "data_prevista": {"$gte": hoje, "$lte": proxima_semana},
-            "status": {"$ne": "concluida"}
-        }).to_list(100)
+        manutencoes_vencidas, manutencoes_proximas = await asyncio.gather(
+            repositorio.manutencoes_em_aberto(organizacao_id, prevista_antes=hoje, limite=limit),
+            repositorio.manutencoes_em_aberto(
+                organizacao_id, prevista_desde=hoje, prevista_antes=proxima_semana, limite=limit
+            )
+        )
         
         notificacoes = []
         
         for manutencao in manutencoes_vencidas:
-            if "_id" in manutencao:
-                del manutencao["_id"]
             notificacoes.append({
                 "id": str(uuid.uuid4()),
                 "tipo": "vencida",
@@ -327,8 +1236,6 @@ async def listar_notificacoes(current_user=Depends(get_current_active_user)):
             })
         
         for manutencao in manutencoes_proximas:
-            if "_id" in manutencao:
-                del manutencao["_id"]
             notificacoes.append({
                 "id": str(uuid.uuid4()),
                 "tipo": "proxima",
@@ -340,15 +1247,987 @@ async def listar_notificacoes(current_user=Depends(get_current_active_user)):
         
         return {"notificacoes": notificacoes, "total": len(notificacoes)}
     except Exception as e:
-        logger.error(f"Erro ao listar notificações: {e}")
+        logger.error("Erro ao listar notificações: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+# Anexos dos equipamentos (manuais, certificados de calibração, fotos)
+# O upload é o corpo bruto da requisição, processado em blocos: o conteúdo é
+# gravado em arquivo temporário enquanto o SHA-256 é calculado, e nunca fica
+# inteiro na memória do worker
+@lru_cache(maxsize=None)
+def get_anexo_storage():
+    from anexos import criar_anexo_storage
+    return criar_anexo_storage(
+        ANEXOS_BACKEND,
+        Path(ANEXOS_DIR),
+        bucket=ANEXOS_S3_BUCKET,
+        endpoint_url=ANEXOS_S3_ENDPOINT_URL
+    )
+
+# Upload e remoção do mesmo conteúdo (organização + sha256) são serializados
+# por um lease em anexos_locks: sem isso, um upload que reaproveita o arquivo
+# existente pode cruzar com a remoção da última referência a ele e ficar
+# apontando para um arquivo apagado
+ANEXOS_LOCK_LEASE = timedelta(minutes=15)
+
+@asynccontextmanager
+async def lock_conteudo_anexo(tenant_db, chave: str):
+    from pymongo.errors import DuplicateKeyError
+    dono = str(uuid.uuid4())
+    while True:
+        agora = datetime.utcnow()
+        try:
+            await tenant_db.anexos_locks.update_one(
+                {"_id": chave, "lease_ate": {"$lt": agora}},
+                {"$set": {"lease_ate": agora + ANEXOS_LOCK_LEASE, "dono": dono}},
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        await tenant_db.anexos_locks.delete_one({"_id": chave, "dono": dono})
+
+async def buscar_equipamento_ou_404(tenant_db, current_user, equipamento_id: str):
+    equipamento = await tenant_db.equipamentos.find_one(
+        tenant_filter(current_user, {"id": equipamento_id}), {"_id": 0, "id": 1}
+    )
+    if equipamento is None:
+        raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+    return equipamento
+
+async def buscar_anexo_ou_404(tenant_db, current_user, equipamento_id: str, anexo_id: str):
+    anexo = await tenant_db.anexos.find_one(
+        tenant_filter(current_user, {"equipamento_id": equipamento_id, "id": anexo_id}),
+        {"_id": 0}
+    )
+    if anexo is None:
+        raise HTTPException(status_code=404, detail="Anexo não encontrado")
+    return anexo
+
+@api_router.post(
+    "/equipamentos/{equipamento_id}/anexos",
+    tags=["Anexos"],
+    status_code=201,
+    dependencies=[Depends(requer_mongo)]
+)
+async def enviar_anexo(
+    equipamento_id: str,
+    request: Request,
+    nome: str,
+    current_user=Depends(get_current_active_user)
+):
+    import hashlib
+    from anexos import normalizar_content_type
+    
+    tenant_db = await get_tenant_db(current_user["organizacao_id"])
+    await buscar_equipamento_ou_404(tenant_db, current_user, equipamento_id)
+    
+    storage = get_anexo_storage()
+    temporario = storage.novo_temporario()
+    limite = ANEXOS_MAX_MB * 1024 * 1024
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    try:
+        arquivo = await asyncio.to_thread(open, temporario, "wb")
+        try:
+            async for bloco in request.stream():
+                tamanho += len(bloco)
+                if tamanho > limite:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Anexo excede o limite de {ANEXOS_MAX_MB} MB"
+                    )
+                sha256.update(bloco)
+                await asyncio.to_thread(arquivo.write, bloco)
+        finally:
+            await asyncio.to_thread(arquivo.close)
+        
+        digest = sha256.hexdigest()
+        chave = f"{current_user['organizacao_id']}/{digest}"
+        anexo = {
+            "id": str(uuid.uuid4()),
+            "organizacao_id": current_user["organizacao_id"],
+            "equipamento_id": equipamento_id,
+            "nome": nome,
+            "content_type": normalizar_content_type(request.headers.get("content-type")),
+            "tamanho": tamanho,
+            "sha256": digest,
+            "created_at": datetime.utcnow(),
+            "created_by": current_user["username"]
+        }
+        # Deduplicação por conteúdo dentro da organização
+        async with lock_conteudo_anexo(tenant_db, chave):
+            if await storage.existe(chave):
+                await asyncio.to_thread(temporario.unlink, missing_ok=True)
+            else:
+                await storage.salvar(chave, temporario)
+            await tenant_db.anexos.insert_one(anexo)
+        del anexo["_id"]
+        return {"message": "Anexo enviado com sucesso", "anexo": anexo}
+    except HTTPException:
+        await asyncio.to_thread(temporario.unlink, missing_ok=True)
+        raise
+    except Exception as e:
+        await asyncio.to_thread(temporario.unlink, missing_ok=True)
+        logger.error("Erro ao enviar anexo: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@api_router.get(
+    "/equipamentos/{equipamento_id}/anexos",
+    tags=["Anexos"],
+    dependencies=[Depends(requer_mongo)]
+)
+async def listar_anexos(equipamento_id: str, current_user=Depends(get_current_active_user)):
+    try:
+        tenant_db = await get_tenant_db(current_user["organizacao_id"])
+        anexos = await tenant_db.anexos.find(
+            tenant_filter(current_user, {"equipamento_id": equipamento_id}), {"_id": 0}
+        ).to_list(1000)
+        return {"anexos": anexos, "total": len(anexos)}
+    except Exception as e:
+        logger.error("Erro ao listar anexos: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@api_router.get(
+    "/equipamentos/{equipamento_id}/anexos/{anexo_id}",
+    tags=["Anexos"],
+    dependencies=[Depends(requer_mongo)]
+)
+async def baixar_anexo(
+    equipamento_id: str,
+    anexo_id: str,
+    request: Request,
+    current_user=Depends(get_current_active_user)
+):
+    from anexos import TIPOS_INLINE, normalizar_content_type, parse_range
+    from urllib.parse import quote
+    
+    tenant_db = await get_tenant_db(current_user["organizacao_id"])
+    anexo = await buscar_anexo_ou_404(tenant_db, current_user, equipamento_id, anexo_id)
+    
+    # Normalizado também aqui para anexos gravados antes da lista de tipos
+    content_type = normalizar_content_type(anexo["content_type"])
+    disposicao = "inline" if content_type in TIPOS_INLINE else "attachment"
+    # O conteúdo é imutável, então o hash serve como ETag forte
+    etag = f'"{anexo["sha256"]}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"{disposicao}; filename*=UTF-8''{quote(anexo['nome'])}",
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "sandbox"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    tamanho = anexo["tamanho"]
+    intervalo = None
+    # If-Range: só atende o intervalo se o cliente ainda tem esta versão
+    if request.headers.get("if-range", etag) == etag:
+        try:
+            intervalo = parse_range(request.headers.get("range"), tamanho)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{tamanho}"}
+            )
+    
+    if intervalo is None:
+        if tamanho == 0:
+            return Response(content=b"", media_type=content_type, headers=headers)
+        inicio, fim = 0, tamanho - 1
+        status_code = 200
+    else:
+        inicio, fim = intervalo
+        status_code = 206
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(fim - inicio + 1)
+    
+    chave = f"{anexo['organizacao_id']}/{anexo['sha256']}"
+    return StreamingResponse(
+        get_anexo_storage().ler(chave, inicio, fim),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
+
+@api_router.delete(
+    "/equipamentos/{equipamento_id}/anexos/{anexo_id}",
+    tags=["Anexos"],
+    dependencies=[Depends(requer_mongo)]
+)
+async def remover_anexo(
+    equipamento_id: str,
+    anexo_id: str,
+    current_user=Depends(get_current_active_user)
+):
+    tenant_db = await get_tenant_db(current_user["organizacao_id"])
+    anexo = await buscar_anexo_ou_404(tenant_db, current_user, equipamento_id, anexo_id)
+    chave = f"{anexo['organizacao_id']}/{anexo['sha256']}"
+    try:
+        async with lock_conteudo_anexo(tenant_db, chave):
+            await tenant_db.anexos.delete_one(tenant_filter(current_user, {"id": anexo_id}))
+            # O arquivo só é apagado quando nenhum outro anexo aponta para o mesmo conteúdo
+            restantes = await tenant_db.anexos.count_documents(
+                tenant_filter(current_user, {"sha256": anexo["sha256"]}), limit=1
+            )
+            if not restantes:
+                await get_anexo_storage().remover(chave)
+        return {"message": "Anexo removido com sucesso"}
+    except Exception as e:
+        logger.error("Erro ao remover anexo: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+# Profiles capturados com X-Profile: 1 (formato folded, para flamegraph/speedscope)
+@api_router.get("/admin/profiles/{profile_id}", tags=["Sistema"], response_class=PlainTextResponse)
+async def baixar_profile(profile_id: str, current_user=Depends(get_current_admin_user)):
+    if len(profile_id) != 32 or any(c not in "0123456789abcdef" for c in profile_id):
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    caminho = Path(PROFILE_DIR) / f"{profile_id}.folded"
+    if not await asyncio.to_thread(caminho.exists):
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    return PlainTextResponse(await asyncio.to_thread(caminho.read_text, encoding="utf-8"))
+
+# Endpoint agregado do dashboard: autentica uma vez e executa as seções
+# pedidas em paralelo, substituindo as chamadas separadas feitas no login
+DASHBOARD_SECOES = ("me", "equipamentos", "manutencoes", "relatorios", "notificacoes")
+
+@api_router.get("/dashboard", tags=["Dashboard"])
+async def carregar_dashboard(
+    secoes: str = ",".join(DASHBOARD_SECOES),
+    limite_equipamentos: int = 1000,
+    limite_manutencoes: int = 1000,
+    limite_notificacoes: int = 100,
+    current_user=Depends(get_current_active_user)
+):
+    pedidas = [secao.strip() for secao in secoes.split(",") if secao.strip()]
+    invalidas = [secao for secao in pedidas if secao not in DASHBOARD_SECOES]
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Seções inválidas: {', '.join(invalidas)}"
+        )
+    
+    tarefas = {
+        "me": lambda: read_users_me(current_user=current_user),
+        "equipamentos": lambda: listar_equipamentos(
+            limit=limite_equipamentos, current_user=current_user
+        ),
+        "manutencoes": lambda: listar_manutencoes(
+            limit=limite_manutencoes, current_user=current_user
+        ),
+        "relatorios": lambda: listar_relatorios(current_user=current_user),
+        "notificacoes": lambda: listar_notificacoes(
+            limit=limite_notificacoes, current_user=current_user
+        ),
+    }
+    pedidas = list(dict.fromkeys(pedidas))
+    resultados = await asyncio.gather(
+        *(tarefas[secao]() for secao in pedidas), return_exceptions=True
+    )
+    
+    # Uma seção com erro não derruba as demais
+    resposta = {}
+    erros = {}
+    for secao, resultado in zip(pedidas, resultados):
+        if isinstance(resultado, HTTPException):
+            erros[secao] = resultado.detail
+        elif isinstance(resultado, Exception):
+            logger.error("Erro na seção %s do dashboard: %s", secao, resultado)
+            erros[secao] = "Erro interno do servidor"
+        else:
+            resposta[secao] = resultado
+    if erros:
+        resposta["erros"] = erros
+    return resposta
+
+# Arquivamento de manutenções concluídas
+# Concluídas há mais de ARCHIVE_AFTER_DAYS saem da coleção principal para
+# manutencoes_arquivo_<ano> (ano de updated_at), mantendo o working set pequeno
+ARQUIVO_PREFIXO = "manutencoes_arquivo_"
+
+def archive_cutoff():
+    return datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+async def listar_anos_arquivo(tenant_db):
+    anos = []
+    for nome in await tenant_db.list_collection_names():
+        if nome.startswith(ARQUIVO_PREFIXO) and nome[len(ARQUIVO_PREFIXO):].isdigit():
+            anos.append(int(nome[len(ARQUIVO_PREFIXO):]))
+    return sorted(anos)
+
+async def buscar_manutencoes(
+    tenant_db,
+    filtro: dict,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    incluir_arquivo: bool = False,
+    limite: int = 1000
+):
+    filtro = dict(filtro)
+    if data_inicio or data_fim:
+        filtro["created_at"] = {}
+        if data_inicio:
+            filtro["created_at"]["$gte"] = data_inicio.replace(tzinfo=None)
+        if data_fim:
+            filtro["created_at"]["$lte"] = data_fim.replace(tzinfo=None)
+    
+    manutencoes = await tenant_db.manutencoes.find(filtro, {"_id": 0}).to_list(limite)
+    
+    # O arquivo só é consultado quando o período pedido alcança registros
+    # arquivados: como created_at <= updated_at, um início posterior ao corte
+    # garante que nada do período foi arquivado. Um período só com data_fim
+    # não tem início e alcança todo o histórico arquivado
+    corte = archive_cutoff()
+    precisa_arquivo = incluir_arquivo or (
+        (data_inicio is not None or data_fim is not None)
+        and (data_inicio is None or data_inicio.replace(tzinfo=None) < corte)
+    )
+    if precisa_arquivo and len(manutencoes) < limite:
+        for ano in reversed(await listar_anos_arquivo(tenant_db)):
+            # Arquivados no ano X têm updated_at em X, logo created_at <= X
+            if data_inicio is not None and ano < data_inicio.year:
+                continue
+            restante = limite - len(manutencoes)
+            arquivadas = await tenant_db[f"{ARQUIVO_PREFIXO}{ano}"].find(
+                filtro, {"_id": 0}
+            ).to_list(restante)
+            for manutencao in arquivadas:
+                manutencao["arquivada"] = True
+            manutencoes.extend(arquivadas)
+            if len(manutencoes) >= limite:
+                break
+    return manutencoes
+
+async def buscar_manutencao_arquivada(tenant_db, filtro: dict):
+    for ano in reversed(await listar_anos_arquivo(tenant_db)):
+        manutencao = await tenant_db[f"{ARQUIVO_PREFIXO}{ano}"].find_one(filtro, {"_id": 0})
+        if manutencao is not None:
+            manutencao["arquivada"] = True
+            return manutencao
+    return None
+
+async def arquivar_manutencoes(tenant_db, organizacao_id: str, corte: Optional[datetime] = None):
+    from pymongo.errors import BulkWriteError
+    corte = corte or archive_cutoff()
+    total = 0
+    anos_indexados = set()
+    while True:
+        lote = await tenant_db.manutencoes.find({
+            "organizacao_id": organizacao_id,
+            "status": "concluida",
+            "updated_at": {"$lt": corte}
+        }).sort("updated_at", 1).to_list(ARCHIVE_BATCH_SIZE)
+        if not lote:
+            break
+        
+        por_ano = {}
+        for manutencao in lote:
+            por_ano.setdefault(manutencao["updated_at"].year, []).append(manutencao)
+        for ano, docs in por_ano.items():
+            arquivo = tenant_db[f"{ARQUIVO_PREFIXO}{ano}"]
+            if ano not in anos_indexados:
+                await arquivo.create_index([("organizacao_id", 1), ("id", 1)], unique=True)
+                await arquivo.create_index([("organizacao_id", 1), ("equipamento_id", 1)])
+                await arquivo.create_index([("organizacao_id", 1), ("created_at", 1)])
+                anos_indexados.add(ano)
+            try:
+                await arquivo.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Duplicados vêm de uma execução anterior interrompida entre a
+                # cópia e a remoção; qualquer outro erro aborta o lote
+                if any(erro.get("code") != 11000 for erro in e.details.get("writeErrors", [])):
+                    raise
+        
+        await tenant_db.manutencoes.delete_many({"_id": {"$in": [m["_id"] for m in lote]}})
+        await tenant_db.arquivo_resumo.update_one(
+            {"_id": organizacao_id}, {"$inc": {"total": len(lote)}}, upsert=True
+        )
+        total += len(lote)
+    return total
+
+async def listar_tenant_dbs():
+    if TENANT_MODE != "database":
+        return [db]
+    prefixo = f"{DB_NAME}_"
+    return [
+        client[nome] for nome in await client.list_database_names()
+        if nome.startswith(prefixo)
+    ]
+
+async def adquirir_lock_job(nome: str, duracao: timedelta):
+    # Lease no banco para que apenas uma réplica execute o job por vez
+    from pymongo.errors import DuplicateKeyError
+    agora = datetime.utcnow()
+    try:
+        await db.job_locks.update_one(
+            {"_id": nome, "lease_ate": {"$lt": agora}},
+            {"$set": {"lease_ate": agora + duracao, "adquirido_em": agora}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def archive_loop():
+    intervalo = timedelta(hours=ARCHIVE_INTERVAL_HOURS)
+    while True:
+        try:
+            if await adquirir_lock_job("arquivamento", intervalo):
+                for tenant_db in await listar_tenant_dbs():
+                    for organizacao_id in await tenant_db.manutencoes.distinct("organizacao_id"):
+                        arquivadas = await arquivar_manutencoes(tenant_db, organizacao_id)
+                        if arquivadas:
+                            logger.info(
+                                "%s manutenções arquivadas (%s)", arquivadas, organizacao_id
+                            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Erro no job de arquivamento: %s", e)
+        await asyncio.sleep(intervalo.total_seconds())
+
+@api_router.get("/equipamentos/{equipamento_id}/manutencoes", tags=["Manutenções"])
+async def historico_equipamento(
+    equipamento_id: str,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    incluir_arquivo: bool = False,
+    current_user=Depends(get_current_active_user)
+):
+    try:
+        manutencoes = await repositorio.listar_manutencoes(
+            current_user["organizacao_id"],
+            equipamento_id=equipamento_id,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            incluir_arquivo=incluir_arquivo
+        )
+        return {"manutencoes": manutencoes, "total": len(manutencoes)}
+    except Exception as e:
+        logger.error("Erro ao buscar histórico do equipamento: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@api_router.post("/manutencoes/arquivar", tags=["Manutenções"], dependencies=[Depends(requer_mongo)])
+async def executar_arquivamento(current_user=Depends(get_current_admin_user)):
+    try:
+        tenant_db = await get_tenant_db(current_user["organizacao_id"])
+        arquivadas = await arquivar_manutencoes(tenant_db, current_user["organizacao_id"])
+        return {"message": "Arquivamento concluído", "arquivadas": arquivadas}
+    except Exception as e:
+        logger.error("Erro ao arquivar manutenções: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+# Análise de confiabilidade (MTBF, MTTR, disponibilidade)
+# Agregados mantidos incrementalmente em confiabilidade_stats a cada falha
+# (manutenção corretiva registrada) e reparo (corretiva concluída)
+CONFIABILIDADE_ENTIDADES = ("equipamento", "modelo", "fabricante", "localizacao")
+
+def chaves_confiabilidade(equipamento_id: str, equipamento: Optional[dict]):
+    chaves = [("equipamento", equipamento_id)]
+    for campo in ("modelo", "fabricante", "localizacao"):
+        valor = (equipamento or {}).get(campo)
+        if valor:
+            chaves.append((campo, valor))
+    return chaves
+
+async def marcar_evento_confiabilidade(colecao, manutencao: dict, evento: str):
+    # Marca a manutenção para que cada falha/reparo seja contado uma única vez,
+    # mesmo que o mesmo registro seja reenviado (sync) ou reprocessado
+    resultado = await colecao.update_one(
+        {
+            "organizacao_id": manutencao["organizacao_id"],
+            "id": manutencao["id"],
+            f"confiabilidade.{evento}": {"$ne": True}
+        },
+        {"$set": {f"confiabilidade.{evento}": True}}
+    )
+    return resultado.modified_count == 1
+
+async def registrar_falha(tenant_db, organizacao_id: str, chaves, data_falha: datetime):
+    from pymongo import ReturnDocument
+    stats = tenant_db.confiabilidade_stats
+    # O intervalo entre falhas é medido por equipamento e somado aos grupos
+    # (modelo/fabricante/localização), para que falhas de aparelhos diferentes
+    # não se intercalem no cálculo do MTBF do grupo
+    anterior = await stats.find_one_and_update(
+        {"organizacao_id": organizacao_id, "tipo_entidade": "equipamento", "chave": chaves[0][1]},
+        {"$inc": {"falhas": 1}, "$max": {"ultima_falha": data_falha}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    intervalo = {}
+    ultima_falha = (anterior or {}).get("ultima_falha")
+    if ultima_falha and data_falha > ultima_falha:
+        intervalo = {
+            "intervalos": 1,
+            "tempo_entre_falhas_s": (data_falha - ultima_falha).total_seconds()
+        }
+        await stats.update_one(
+            {"organizacao_id": organizacao_id, "tipo_entidade": "equipamento", "chave": chaves[0][1]},
+            {"$inc": intervalo}
+        )
+    for tipo_entidade, chave in chaves[1:]:
+        await stats.update_one(
+            {"organizacao_id": organizacao_id, "tipo_entidade": tipo_entidade, "chave": chave},
+            {"$inc": {"falhas": 1, **intervalo}, "$max": {"ultima_falha": data_falha}},
+            upsert=True
+        )
+
+async def registrar_reparo(tenant_db, organizacao_id: str, chaves, duracao_s: float):
+    for tipo_entidade, chave in chaves:
+        await tenant_db.confiabilidade_stats.update_one(
+            {"organizacao_id": organizacao_id, "tipo_entidade": tipo_entidade, "chave": chave},
+            {"$inc": {"reparos": 1, "tempo_reparo_s": duracao_s}},
+            upsert=True
+        )
+
+async def atualizar_confiabilidade(tenant_db, manutencao: dict, colecao=None):
+    # colecao: onde a manutenção está (principal ou manutencoes_arquivo_<ano>)
+    if manutencao.get("tipo") != "corretiva" or not manutencao.get("equipamento_id"):
+        return
+    colecao = colecao if colecao is not None else tenant_db.manutencoes
+    try:
+        organizacao_id = manutencao["organizacao_id"]
+        equipamento = await tenant_db.equipamentos.find_one(
+            {"organizacao_id": organizacao_id, "id": manutencao["equipamento_id"]},
+            {"_id": 0, "modelo": 1, "fabricante": 1, "localizacao": 1}
+        )
+        chaves = chaves_confiabilidade(manutencao["equipamento_id"], equipamento)
+        data_falha = parse_data(manutencao.get("data_falha")) or parse_data(manutencao.get("created_at"))
+        if data_falha is None:
+            return
+        
+        if await marcar_evento_confiabilidade(colecao, manutencao, "falha"):
+            await registrar_falha(tenant_db, organizacao_id, chaves, data_falha)
+        
+        if manutencao.get("status") == "concluida":
+            data_conclusao = (
+                parse_data(manutencao.get("data_conclusao"))
+                or parse_data(manutencao.get("updated_at"))
+                or datetime.utcnow()
+            )
+            if await marcar_evento_confiabilidade(colecao, manutencao, "reparo"):
+                duracao_s = max((data_conclusao - data_falha).total_seconds(), 0)
+                await registrar_reparo(tenant_db, organizacao_id, chaves, duracao_s)
+    except Exception as e:
+        # A análise nunca deve impedir o registro da manutenção
+        logger.error("Erro ao atualizar estatísticas de confiabilidade: %s", e)
+
+async def backfill_confiabilidade(tenant_db, organizacao_id: str):
+    # Reprocessa todo o histórico em ordem cronológica de falha, incluindo as
+    # corretivas já movidas para as coleções de arquivo
+    filtro = {"organizacao_id": organizacao_id, "tipo": "corretiva"}
+    colecoes = [tenant_db.manutencoes] + [
+        tenant_db[f"{ARQUIVO_PREFIXO}{ano}"] for ano in await listar_anos_arquivo(tenant_db)
+    ]
+    await tenant_db.confiabilidade_stats.delete_many({"organizacao_id": organizacao_id})
+    corretivas = []
+    for colecao in colecoes:
+        await colecao.update_many(filtro, {"$unset": {"confiabilidade": ""}})
+        docs = await colecao.find(filtro, {"_id": 0}).to_list(None)
+        corretivas.extend((manutencao, colecao) for manutencao in docs)
+    corretivas.sort(key=lambda item: (
+        parse_data(item[0].get("data_falha")) or parse_data(item[0].get("created_at")) or datetime.min
+    ))
+    for manutencao, colecao in corretivas:
+        await atualizar_confiabilidade(tenant_db, manutencao, colecao)
+    return len(corretivas)
+
+def formatar_confiabilidade(stats: dict):
+    horas = 3600
+    falhas = stats.get("falhas", 0)
+    reparos = stats.get("reparos", 0)
+    intervalos = stats.get("intervalos", 0)
+    mtbf = stats.get("tempo_entre_falhas_s", 0) / intervalos / horas if intervalos else None
+    mttr = stats.get("tempo_reparo_s", 0) / reparos / horas if reparos else None
+    disponibilidade = None
+    # O MTBF vai do início de uma falha ao início da seguinte e já contém o
+    # tempo de reparo, então a fração em operação é (MTBF - MTTR) / MTBF
+    if mtbf is not None and mttr is not None and mtbf > 0:
+        disponibilidade = round(max(mtbf - mttr, 0) / mtbf, 4)
+    return {
+        "tipo_entidade": stats["tipo_entidade"],
+        "chave": stats["chave"],
+        "falhas": falhas,
+        "reparos": reparos,
+        "falhas_em_aberto": max(falhas - reparos, 0),
+        "mtbf_horas": round(mtbf, 2) if mtbf is not None else None,
+        "mttr_horas": round(mttr, 2) if mttr is not None else None,
+        "tempo_parado_horas": round(stats.get("tempo_reparo_s", 0) / horas, 2),
+        "disponibilidade": disponibilidade,
+        "ultima_falha": stats.get("ultima_falha")
+    }
+
+@api_router.get("/analytics/confiabilidade", tags=["Relatórios"], dependencies=[Depends(requer_mongo)])
+async def listar_confiabilidade(
+    tipo: str = "equipamento",
+    chave: Optional[str] = None,
+    current_user=Depends(get_current_active_user)
+):
+    if tipo not in CONFIABILIDADE_ENTIDADES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"tipo deve ser um de: {', '.join(CONFIABILIDADE_ENTIDADES)}"
+        )
+    try:
+        tenant_db = await get_tenant_db(current_user["organizacao_id"])
+        filtro = tenant_filter(current_user, {"tipo_entidade": tipo})
+        if chave is not None:
+            filtro["chave"] = chave
+        stats = await tenant_db.confiabilidade_stats.find(filtro, {"_id": 0}).to_list(1000)
+        resultado = [formatar_confiabilidade(item) for item in stats]
+        return {"confiabilidade": resultado, "total": len(resultado)}
+    except Exception as e:
+        logger.error("Erro ao listar confiabilidade: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@api_router.post(
+    "/analytics/confiabilidade/backfill",
+    tags=["Relatórios"],
+    dependencies=[Depends(requer_mongo)]
+)
+async def recalcular_confiabilidade(current_user=Depends(get_current_admin_user)):
+    try:
+        tenant_db = await get_tenant_db(current_user["organizacao_id"])
+        processadas = await backfill_confiabilidade(tenant_db, current_user["organizacao_id"])
+        return {"message": "Estatísticas recalculadas", "manutencoes_processadas": processadas}
+    except Exception as e:
+        logger.error("Erro ao recalcular confiabilidade: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+# Sincronização incremental (delta-sync) para clientes offline
+SYNC_COLECOES = ("equipamentos", "manutencoes")
+SYNC_PAGE_LIMIT = 1000
+# Campos controlados pelo servidor que o cliente não pode sobrescrever
+SYNC_CAMPOS_PROTEGIDOS = (
+    "_id", "id", "organizacao_id", "sync_seq", "created_at", "created_by", "confiabilidade"
+)
+
+def parse_sync_token(sync_token: Optional[str]):
+    if not sync_token:
+        return 0
+    try:
+        seq = int(sync_token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido")
+    return seq
+
+@api_router.get("/sync", tags=["Sincronização"], dependencies=[Depends(requer_mongo)])
+async def sync_download(
+    since: Optional[str] = None,
+    limit: int = 500,
+    current_user=Depends(get_current_active_user)
+):
+    desde = parse_sync_token(since)
+    limit = max(1, min(limit, SYNC_PAGE_LIMIT))
+    try:
+        tenant_db = await get_tenant_db(current_user["organizacao_id"])
+        # Só entrega documentos até o último seq sem escrita em andamento
+        # abaixo dele; o restante vem na próxima chamada
+        watermark = await sync_watermark(tenant_db, current_user["organizacao_id"])
+        filtro = tenant_filter(current_user, {"sync_seq": {"$gt": desde, "$lte": watermark}})
+        
+        # Cada fonte lê no máximo limit + 1 documentos pelo índice
+        # (organizacao_id, sync_seq); o merge mantém a ordem global
+        eventos = []
+        fontes = [(nome, tenant_db[nome]) for nome in SYNC_COLECOES]
+        fontes.append(("tombstones", tenant_db.sync_tombstones))
+        for nome, colecao in fontes:
+            docs = await colecao.find(filtro, {"_id": 0}).sort("sync_seq", 1).to_list(limit + 1)
+            eventos.extend((doc["sync_seq"], nome, doc) for doc in docs)
+        eventos.sort(key=lambda evento: evento[0])
+        
+        has_more = len(eventos) > limit
+        pagina = eventos[:limit]
+        changes = {nome: [] for nome in SYNC_COLECOES}
+        deleted = []
+        for seq, nome, doc in pagina:
+            if nome == "tombstones":
+                deleted.append({"colecao": doc["colecao"], "id": doc["id"], "sync_seq": seq})
+            else:
+                changes[nome].append(doc)
+        
+        proximo = pagina[-1][0] if pagina else desde
+        return {
+            "changes": changes,
+            "deleted": deleted,
+            "sync_token": str(proximo),
+            "has_more": has_more
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro na sincronização (download): %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@api_router.post("/sync", tags=["Sincronização"], dependencies=[Depends(requer_mongo)])
+async def sync_upload(body: SyncUpload, current_user=Depends(get_current_active_user)):
+    from pymongo.errors import DuplicateKeyError
+    organizacao_id = current_user["organizacao_id"]
+    try:
+        tenant_db = await get_tenant_db(organizacao_id)
+        aplicadas = []
+        conflitos = []
+        for change in body.changes:
+            if change.colecao not in SYNC_COLECOES or change.op not in ("upsert", "delete"):
+                conflitos.append({
+                    "colecao": change.colecao,
+                    "id": change.id,
+                    "motivo": "operacao_invalida"
+                })
+                continue
+            if change.colecao == "manutencoes" and change.data:
+                try:
+                    normalizar_datas_manutencao(change.data)
+                except ValueError:
+                    conflitos.append({
+                        "colecao": change.colecao,
+                        "id": change.id,
+                        "motivo": "operacao_invalida"
+                    })
+                    continue
+            colecao = tenant_db[change.colecao]
+            filtro_doc = tenant_filter(current_user, {"id": change.id})
+            atual = await colecao.find_one(filtro_doc, {"_id": 0})
+            
+            # Conflito: manutenções arquivadas saíram da coleção principal e
+            # não podem ser recriadas nem removidas pelo sync
+            if atual is None and change.colecao == "manutencoes":
+                arquivada = await buscar_manutencao_arquivada(tenant_db, filtro_doc)
+                if arquivada is not None:
+                    conflitos.append({
+                        "colecao": change.colecao,
+                        "id": change.id,
+                        "motivo": "arquivada",
+                        "servidor": arquivada
+                    })
+                    continue
+            
+            # Conflito: o documento foi removido no servidor depois da versão
+            # que o cliente conhecia; o upsert não pode ressuscitá-lo
+            if atual is None and change.op == "upsert":
+                tombstone = await tenant_db.sync_tombstones.find_one(
+                    tenant_filter(current_user, {"colecao": change.colecao, "id": change.id}),
+                    {"_id": 0},
+                    sort=[("sync_seq", -1)]
+                )
+                if tombstone is not None and (
+                    change.base_seq is None or tombstone["sync_seq"] > change.base_seq
+                ):
+                    conflitos.append({
+                        "colecao": change.colecao,
+                        "id": change.id,
+                        "motivo": "removido_no_servidor",
+                        "servidor": tombstone
+                    })
+                    continue
+            
+            # Conflito: o documento mudou no servidor depois da versão que o
+            # cliente editou offline (ou o cliente não informou a versão base)
+            if atual is not None and (
+                change.base_seq is None or atual.get("sync_seq", 0) > change.base_seq
+            ):
+                conflitos.append({
+                    "colecao": change.colecao,
+                    "id": change.id,
+                    "motivo": "versao_desatualizada",
+                    "servidor": atual
+                })
+                continue
+            
+            # A verificação acima é repetida no filtro da própria escrita:
+            # entre a leitura e a escrita outro cliente pode ter gravado a
+            # mesma versão base, e só um dos dois deve vencer
+            if atual is not None:
+                filtro_doc["sync_seq"] = {"$not": {"$gt": change.base_seq}}
+            aplicada = True
+            async with reservar_sync_seq(tenant_db, organizacao_id) as seq:
+                agora = datetime.utcnow()
+                if change.op == "delete":
+                    if atual is not None:
+                        resultado = await colecao.delete_one(filtro_doc)
+                        aplicada = resultado.deleted_count == 1
+                    if aplicada:
+                        await tenant_db.sync_tombstones.insert_one({
+                            "organizacao_id": organizacao_id,
+                            "colecao": change.colecao,
+                            "id": change.id,
+                            "sync_seq": seq,
+                            "deleted_at": agora,
+                            "deleted_by": current_user["username"]
+                        })
+                else:
+                    dados = {
+                        chave: valor for chave, valor in (change.data or {}).items()
+                        if chave not in SYNC_CAMPOS_PROTEGIDOS
+                    }
+                    dados.update({"sync_seq": seq, "updated_at": agora})
+                    if atual is not None:
+                        resultado = await colecao.update_one(filtro_doc, {"$set": dados})
+                        aplicada = resultado.matched_count == 1
+                    else:
+                        # Inserção sem upsert: com o índice único (organizacao_id, id),
+                        # dois clientes criando o mesmo id não se sobrescrevem
+                        try:
+                            await colecao.insert_one({
+                                **dados,
+                                "id": change.id,
+                                "organizacao_id": organizacao_id,
+                                "created_at": agora,
+                                "created_by": current_user["username"]
+                            })
+                        except DuplicateKeyError:
+                            aplicada = False
+            
+            if not aplicada:
+                conflitos.append({
+                    "colecao": change.colecao,
+                    "id": change.id,
+                    "motivo": "versao_desatualizada",
+                    "servidor": await colecao.find_one(
+                        tenant_filter(current_user, {"id": change.id}), {"_id": 0}
+                    )
+                })
+                continue
+            if change.op == "upsert" and change.colecao == "manutencoes":
+                await atualizar_confiabilidade(tenant_db, {
+                    **(atual or {}),
+                    **dados,
+                    "id": change.id,
+                    "organizacao_id": organizacao_id,
+                    "created_at": (atual or {}).get("created_at", agora)
+                })
+            aplicadas.append({"colecao": change.colecao, "id": change.id, "sync_seq": seq})
+        
+        return {"aplicadas": aplicadas, "conflitos": conflitos}
+    except Exception as e:
+        logger.error("Erro na sincronização (upload): %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 # Include the router in the main app
 app.include_router(api_router)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Coleções que passam de DB_NAME para DB_NAME_<organização> ao adotar
+# TENANT_MODE=database (users e job_locks continuam no banco principal)
+COLECOES_POR_ORGANIZACAO = (
+    "equipamentos", "manutencoes", "anexos", "sync_tombstones", "confiabilidade_stats"
+)
+# Contadores cujo _id é a própria organização
+CONTADORES_POR_ORGANIZACAO = ("sync_counters", "arquivo_resumo")
+
+async def migrar_para_bancos_por_organizacao():
+    """Move os dados do banco compartilhado para um banco por organização.
+
+    Idempotente: cada lote é copiado (upsert por _id) antes de ser removido
+    da origem, então uma execução interrompida é retomada na próxima.
+    """
+    from pymongo import ReplaceOne
+    nomes = [
+        nome for nome in await db.list_collection_names()
+        if nome in COLECOES_POR_ORGANIZACAO or nome.startswith(ARQUIVO_PREFIXO)
+    ]
+    movidos = 0
+    for nome in nomes:
+        while True:
+            lote = await db[nome].find({}).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+            if not lote:
+                break
+            por_organizacao = {}
+            for doc in lote:
+                organizacao_id = doc.get("organizacao_id", DEFAULT_ORGANIZACAO)
+                por_organizacao.setdefault(organizacao_id, []).append(doc)
+            for organizacao_id, docs in por_organizacao.items():
+                tenant_db = await get_tenant_db(organizacao_id)
+                await tenant_db[nome].bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+                    ordered=False
+                )
+            await db[nome].delete_many({"_id": {"$in": [doc["_id"] for doc in lote]}})
+            movidos += len(lote)
+    for nome in CONTADORES_POR_ORGANIZACAO:
+        for contador in await db[nome].find({}).to_list(None):
+            tenant_db = await get_tenant_db(contador["_id"])
+            valores = {
+                campo: valor for campo, valor in contador.items()
+                if campo != "_id" and isinstance(valor, (int, float))
+            }
+            # $max mantém o contador correto mesmo se a cópia for repetida
+            await tenant_db[nome].update_one(
+                {"_id": contador["_id"]}, {"$max": valores}, upsert=True
+            )
+            await db[nome].delete_one({"_id": contador["_id"]})
+    if movidos:
+        logger.info("%s documentos movidos para bancos por organização", movidos)
+
+async def migrar_datas_manutencao(tenant_db):
+    # Manutenções gravadas antes da normalização guardavam as datas como texto,
+    # que não casam com os filtros de intervalo por datetime
+    for campo in CAMPOS_DATA_MANUTENCAO:
+        async for manutencao in tenant_db.manutencoes.find(
+            {campo: {"$type": "string"}}, {"_id": 1, campo: 1}
+        ):
+            data = parse_data(manutencao[campo])
+            if data is not None:
+                await tenant_db.manutencoes.update_one(
+                    {"_id": manutencao["_id"], campo: manutencao[campo]},
+                    {"$set": {campo: data}}
+                )
+
+async def preparar_banco():
+    """Índices, migrações de dados legados e backfill de sync_seq (idempotente)."""
+    await db.users.create_index("username", unique=True)
+    # Documentos anteriores ao multi-tenancy pertencem à organização padrão
+    for colecao in (db.users, db.equipamentos, db.manutencoes):
+        await colecao.update_many(
+            {"organizacao_id": {"$exists": False}},
+            {"$set": {"organizacao_id": DEFAULT_ORGANIZACAO}}
+        )
+    if TENANT_MODE == "database":
+        await migrar_para_bancos_por_organizacao()
+    await get_tenant_db(DEFAULT_ORGANIZACAO)
+    for tenant_db in await listar_tenant_dbs():
+        await criar_indices_tenant(tenant_db)
+        await migrar_datas_manutencao(tenant_db)
+        await backfill_sync_seq(tenant_db)
+
+async def preparar_banco_em_segundo_plano():
+    # Uma réplica por vez; com o banco indisponível, tenta de novo depois
+    while True:
+        try:
+            if not await adquirir_lock_job("preparar_banco", timedelta(minutes=30)):
+                return
+            try:
+                await preparar_banco()
+            except BaseException:
+                # Libera o lease para a nova tentativa (desta ou de outra réplica)
+                await asyncio.shield(db.job_locks.delete_one({"_id": "preparar_banco"}))
+                raise
+            logger.info("Banco preparado (índices, migrações e backfills)")
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Erro ao preparar o banco; nova tentativa em 60s: %s", e)
+        await asyncio.sleep(60)
+
+async def executar_migracoes():
+    conectar_mongo()
+    try:
+        await preparar_banco()
+    finally:
+        client.close()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if sys.argv[1:] == ["migrar"]:
+        asyncio.run(executar_migracoes())
+    else:
+        import uvicorn
+        # Sem log_config=None o uvicorn reaplica o próprio dictConfig depois de
+        # configurar_logging() e devolve handlers síncronos aos seus loggers
+        uvicorn.run(app, host="0.0.0.0", port=8001, log_config=None)
@@ -1,9 +1,17 @@
 
 import requests
 import sys
+import os
+import subprocess
 from datetime import datetime, timedelta
 import json
 
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+# Orçamento de tempo de importação do módulo server (ms)
+IMPORT_TIME_BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "1000"))
+# Módulos pesados que não devem ser carregados na importação do server
+LAZY_MODULES = ("motor", "pymongo", "jose", "passlib", "uvicorn", "sqlalchemy")
+
 class MedicalEquipmentAPITester:
     def __init__(self, base_url):
         self.base_url = base_url
@@ -220,6 +228,50 @@ class MedicalEquipmentAPITester:
         
         return success, response
 
+    def test_import_time(self, budget_ms=IMPORT_TIME_BUDGET_MS):
+        """Test that importing the server module stays within the startup budget"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing server import time (budget {budget_ms}ms)...")
+        
+        script = (
+            "import sys, server; "
+            f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+        )
+        try:
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", script],
+                cwd=BACKEND_DIR,
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            if result.returncode != 0:
+                print(f"❌ Failed - Import error: {result.stderr.strip().splitlines()[-1:]}")
+                return False, {}
+            
+            # Última linha do -X importtime: "import time: self | cumulative | server"
+            cumulative_us = 0
+            for line in result.stderr.splitlines():
+                parts = line.split("|")
+                if len(parts) == 3 and parts[2].strip() == "server":
+                    cumulative_us = int(parts[1])
+            elapsed_ms = cumulative_us / 1000
+            loaded = [m for m in result.stdout.strip().split(",") if m]
+            
+            if loaded:
+                print(f"❌ Failed - Heavy modules imported at startup: {', '.join(loaded)}")
+                return False, {"import_ms": elapsed_ms, "loaded": loaded}
+            if elapsed_ms > budget_ms:
+                print(f"❌ Failed - Import took {elapsed_ms:.0f}ms")
+                return False, {"import_ms": elapsed_ms}
+            
+            self.tests_passed += 1
+            print(f"✅ Passed - Import took {elapsed_ms:.0f}ms")
+            return True, {"import_ms": elapsed_ms}
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False, {}
+
     def test_get_notifications(self):
         """Test getting notifications"""
         success, response = self.run_test(
@@ -244,6 +296,9 @@ def main():
     # Setup tester
     tester = MedicalEquipmentAPITester(backend_url)
     
+    # Test 0: Startup budget (local, does not need the remote backend)
+    tester.test_import_time()
+    
     # Test 1: Login with valid credentials
     success, _ = tester.test_login("admin", "admin")
     if not success:
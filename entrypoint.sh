@@ -4,18 +4,65 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
+# JWT signing keys must survive restarts and be shared by every replica, so
+# they live in JWT_KEYS_DIR (mount a volume or secret there). A key is only
+# generated when the directory has none; the link makes concurrent starts on
+# a shared volume agree on a single key.
+export JWT_KEYS_DIR="${JWT_KEYS_DIR:-/data/jwt}"
+if ! ls "$JWT_KEYS_DIR"/*.pem >/dev/null 2>&1; then
+    echo "No JWT keys in $JWT_KEYS_DIR, generating one"
+    mkdir -p "$JWT_KEYS_DIR"
+    python3 - "$JWT_KEYS_DIR" <<'EOF'
+import os
+import sys
+import time
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+diretorio = sys.argv[1]
+chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+temporario = os.path.join(diretorio, f".{os.getpid()}.tmp")
+with open(os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as arquivo:
+    arquivo.write(chave.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ))
+try:
+    os.link(temporario, os.path.join(diretorio, time.strftime("%Y-%m") + ".pem"))
+except FileExistsError:
+    pass
+finally:
+    os.unlink(temporario)
+EOF
+fi
+
 echo "Starting FastAPI backend"
 # Start Uvicorn with proper host binding
 uvicorn server:app --host 0.0.0.0 --port 8001 &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
-sleep 30
+# Poll the health endpoint instead of sleeping a fixed amount of time
+STARTUP_TIMEOUT=${STARTUP_TIMEOUT:-30}
+ELAPSED=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/health 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$ELAPSED" -ge "$STARTUP_TIMEOUT" ]; then
+        echo "Backend did not become ready within ${STARTUP_TIMEOUT}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 1
+    ELAPSED=$((ELAPSED + 1))
+done
+echo "Backend ready after ${ELAPSED}s"
 
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Keep nginx's upload limit in sync with the backend's ANEXOS_MAX_MB
+sed -i "s/client_max_body_size [0-9]*m;/client_max_body_size ${ANEXOS_MAX_MB:-100}m;/" /etc/nginx/nginx.conf
 
 # Start Nginx
 nginx -g 'daemon off;' &
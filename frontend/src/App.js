@@ -6,6 +6,31 @@ import axios from "axios";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Renovação do token de acesso (de curta duração) usando o refresh token.
+// Requisições concorrentes compartilham a mesma renovação, pois cada
+// refresh token só pode ser usado uma vez.
+let refreshPromise = null;
+
+const refreshAccessToken = () => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return Promise.reject(new Error('Sem refresh token'));
+  }
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${API}/token/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Componente de Login
 const Login = ({ onLogin }) => {
   const [username, setUsername] = useState("");
@@ -29,8 +54,11 @@ const Login = ({ onLogin }) => {
         },
       });
 
-      const { access_token } = response.data;
+      const { access_token, refresh_token } = response.data;
       localStorage.setItem('token', access_token);
+      if (refresh_token) {
+        localStorage.setItem('refresh_token', refresh_token);
+      }
       onLogin(access_token);
     } catch (error) {
       setError('Credenciais inválidas');
@@ -303,7 +331,7 @@ const MaintenanceModal = ({ isOpen, onClose, onSave, equipamentos }) => {
 };
 
 // Dashboard Principal
-const Dashboard = ({ token, onLogout }) => {
+const Dashboard = ({ token, onLogout, onTokenRefresh }) => {
   const [activeTab, setActiveTab] = useState('equipamentos');
   const [equipamentos, setEquipamentos] = useState([]);
   const [manutencoes, setManutencoes] = useState([]);
@@ -324,34 +352,63 @@ const Dashboard = ({ token, onLogout }) => {
     },
   });
 
+  // Em 401, renovar o token e repetir a requisição uma única vez
+  apiClient.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+      const original = error.config;
+      const isLogout = original.url === '/logout';
+      if (error.response && error.response.status === 401 && !original._retry && !isLogout) {
+        original._retry = true;
+        try {
+          const newToken = await refreshAccessToken();
+          // O apiClient é recriado a cada render a partir do token do App:
+          // sem atualizar o estado, toda requisição seguinte voltaria a dar 401
+          onTokenRefresh(newToken);
+          original.headers['Authorization'] = `Bearer ${newToken}`;
+          return apiClient(original);
+        } catch (refreshError) {
+          handleLogout();
+        }
+      }
+      return Promise.reject(error);
+    }
+  );
+
   useEffect(() => {
-    loadUserInfo();
-    loadData();
+    loadData(true);
   }, []);
 
-  const loadUserInfo = async () => {
-    try {
-      const response = await apiClient.get('/me');
-      setUser(response.data);
-    } catch (error) {
-      console.error('Erro ao carregar informações do usuário:', error);
-    }
-  };
-
-  const loadData = async () => {
+  // Uma única requisição ao /dashboard traz todas as seções
+  const loadData = async (incluirUsuario = false) => {
     setLoading(true);
     try {
-      const [equipResp, manutResp, relResp, notifResp] = await Promise.all([
-        apiClient.get('/equipamentos'),
-        apiClient.get('/manutencoes'),
-        apiClient.get('/relatorios'),
-        apiClient.get('/notificacoes')
-      ]);
-
-      setEquipamentos(equipResp.data.equipamentos || []);
-      setManutencoes(manutResp.data.manutencoes || []);
-      setRelatorio(relResp.data.relatorio);
-      setNotificacoes(notifResp.data.notificacoes || []);
+      const secoes = ['equipamentos', 'manutencoes', 'relatorios', 'notificacoes'];
+      if (incluirUsuario) {
+        secoes.unshift('me');
+      }
+      const { data } = await apiClient.get('/dashboard', {
+        params: { secoes: secoes.join(',') },
+      });
+
+      if (data.me) {
+        setUser(data.me);
+      }
+      if (data.equipamentos) {
+        setEquipamentos(data.equipamentos.equipamentos || []);
+      }
+      if (data.manutencoes) {
+        setManutencoes(data.manutencoes.manutencoes || []);
+      }
+      if (data.relatorios) {
+        setRelatorio(data.relatorios.relatorio);
+      }
+      if (data.notificacoes) {
+        setNotificacoes(data.notificacoes.notificacoes || []);
+      }
+      if (data.erros) {
+        console.error('Erro ao carregar seções do dashboard:', data.erros);
+      }
     } catch (error) {
       console.error('Erro ao carregar dados:', error);
     } finally {
@@ -360,7 +417,12 @@ const Dashboard = ({ token, onLogout }) => {
   };
 
   const handleLogout = () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    apiClient
+      .post('/logout', refreshToken ? { refresh_token: refreshToken } : undefined)
+      .catch(() => {});
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     onLogout();
   };
 
@@ -655,7 +717,7 @@ function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
 
   useEffect(() => {
-    if (token) {
+    if (token && !isAuthenticated) {
       // Verificar se o token é válido
       checkTokenValidity();
     }
@@ -678,8 +740,15 @@ function App() {
         setIsAuthenticated(true);
       }
     } catch (error) {
-      console.error('Token inválido:', error);
+      try {
+        // Token de acesso expirado: tentar renovar antes de deslogar
+        setToken(await refreshAccessToken());
+        return;
+      } catch (refreshError) {
+        console.error('Token inválido:', error);
+      }
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       setToken(null);
       setIsAuthenticated(false);
     }
@@ -695,6 +764,11 @@ function App() {
     setIsAuthenticated(false);
   };
 
+  // Token renovado pelo Dashboard (o refresh já salvou no localStorage)
+  const handleTokenRefresh = (newToken) => {
+    setToken(newToken);
+  };
+
   return (
     <div className="App">
       <BrowserRouter>
@@ -703,7 +777,11 @@ function App() {
             path="/" 
             element={
               isAuthenticated ? (
-                <Dashboard token={token} onLogout={handleLogout} />
+                <Dashboard
+                  token={token}
+                  onLogout={handleLogout}
+                  onTokenRefresh={handleTokenRefresh}
+                />
               ) : (
                 <Login onLogin={handleLogin} />
               )
@@ -94,11 +94,20 @@ if [ ! -f ".env" ]; then
     cat > .env << EOF
 MONGO_URL="mongodb://localhost:27017"
 DB_NAME="equipamentos_db"
-SECRET_KEY="sua_chave_secreta_para_jwt_equipamentos_medicos_2024"
+JWT_KEYS_DIR="$(pwd)/jwt_keys"
 EOF
     print_success "Arquivo .env criado no backend"
 fi
 
+# Gerar chave de assinatura JWT (RS256) se ainda não existir
+if [ ! -d "jwt_keys" ]; then
+    mkdir -p jwt_keys
+    openssl genpkey -algorithm RSA -pkeyopt rsa_keygen_bits:2048 \
+        -out "jwt_keys/$(date +%Y-%m).pem" 2>/dev/null
+    chmod 600 jwt_keys/*.pem
+    print_success "Chave JWT gerada em backend/jwt_keys"
+fi
+
 cd ..
 
 print_status "Configurando Frontend..."
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+def abrir_cliente(backend, tmp_path, monkeypatch):
+    """TestClient do app com o backend de armazenamento pedido.
+
+    O backend mongo roda sobre o mongomock-motor, em um banco novo por teste.
+    """
+    if backend == "sql":
+        pytest.importorskip("sqlalchemy")
+        pytest.importorskip("aiosqlite")
+        monkeypatch.setattr(server, "SQLALCHEMY_URL", f"sqlite+aiosqlite:///{tmp_path / 'teste.db'}")
+    elif backend == "mongo":
+        motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        monkeypatch.setattr(motor_asyncio, "AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient)
+        monkeypatch.setattr(server, "_tenant_dbs_indexados", set())
+        monkeypatch.setattr(server, "DB_MIGRATIONS_ON_STARTUP", False)
+        monkeypatch.setattr(server, "ANEXOS_BACKEND", "local")
+        monkeypatch.setattr(server, "ANEXOS_DIR", str(tmp_path / "anexos"))
+        server.get_anexo_storage.cache_clear()
+    monkeypatch.setattr(server, "STORAGE_BACKEND", backend)
+    monkeypatch.setattr(server, "ARCHIVE_INTERVAL_HOURS", 0)
+    monkeypatch.setattr(server, "REDIS_URL", None)
+    monkeypatch.setattr(server, "TRACE_EXPORTER", "none")
+    monkeypatch.setattr(server, "JWT_EPHEMERAL_KEYS", True)
+    return TestClient(server.app)
+
+
+def login(cliente, username="admin", password="admin"):
+    resposta = cliente.post("/api/login", data={"username": username, "password": password})
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def autorizacao(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def criar_usuario(cliente, username, password, organizacao_id):
+    agora = datetime.utcnow()
+    cliente.portal.call(server.repositorio.criar_usuario, {
+        "id": f"id-{username}",
+        "username": username,
+        "hashed_password": server.get_password_hash(password),
+        "disabled": False,
+        "role": "tecnico",
+        "organizacao_id": organizacao_id,
+        "created_at": agora,
+        "updated_at": agora,
+    })
@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# O backend não é um pacote instalável; os módulos são importados pelo nome
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from tests.apoio import abrir_cliente  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sql", "mongo"])
+def cliente(request, tmp_path, monkeypatch):
+    with abrir_cliente(request.param, tmp_path, monkeypatch) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def cliente_mongo(tmp_path, monkeypatch):
+    with abrir_cliente("mongo", tmp_path, monkeypatch) as cliente:
+        yield cliente
@@ -0,0 +1,144 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+import server
+from anexos import normalizar_content_type, parse_range
+from tests.apoio import autorizacao, login
+
+
+@pytest.mark.parametrize("cabecalho, esperado", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes= 5 - 9 ", (5, 9)),
+])
+def test_parse_range_valido(cabecalho, esperado):
+    assert parse_range(cabecalho, 1000) == esperado
+
+
+@pytest.mark.parametrize("cabecalho", [
+    None,
+    "",
+    "items=0-10",
+    "bytes=0-10,20-30",
+])
+def test_parse_range_ignorado(cabecalho):
+    # Cabeçalhos ausentes, de outra unidade ou com múltiplos intervalos
+    # resultam na resposta completa
+    assert parse_range(cabecalho, 1000) is None
+
+
+@pytest.mark.parametrize("cabecalho", [
+    "bytes=1000-",
+    "bytes=1000-1001",
+    "bytes=50-10",
+    "bytes=-0",
+    "bytes=abc",
+    "bytes=-",
+    "bytes=1-x",
+])
+def test_parse_range_invalido(cabecalho):
+    with pytest.raises(ValueError):
+        parse_range(cabecalho, 1000)
+
+
+def test_parse_range_arquivo_vazio():
+    with pytest.raises(ValueError):
+        parse_range("bytes=0-", 0)
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("application/pdf", "application/pdf"),
+    ("IMAGE/PNG; charset=binary", "image/png"),
+    ("text/html", "application/octet-stream"),
+    ("image/svg+xml", "application/octet-stream"),
+    (None, "application/octet-stream"),
+])
+def test_normalizar_content_type(valor, esperado):
+    assert normalizar_content_type(valor) == esperado
+
+
+@pytest.fixture
+def equipamento(cliente_mongo):
+    admin = autorizacao(login(cliente_mongo))
+    resposta = cliente_mongo.post("/api/equipamentos", json={"nome": "Monitor"}, headers=admin)
+    return admin, f"/api/equipamentos/{resposta.json()['equipamento']['id']}/anexos"
+
+
+def enviar(cliente, equipamento, conteudo, content_type, nome="arquivo"):
+    admin, url = equipamento
+    resposta = cliente.post(
+        url, params={"nome": nome}, content=conteudo,
+        headers={**admin, "Content-Type": content_type}
+    )
+    assert resposta.status_code == 201, resposta.text
+    return resposta.json()["anexo"]
+
+
+def test_html_enviado_nao_e_servido_inline(cliente_mongo, equipamento):
+    admin, url = equipamento
+    anexo = enviar(cliente_mongo, equipamento, b"<script>alert(1)</script>", "text/html")
+    assert anexo["content_type"] == "application/octet-stream"
+
+    resposta = cliente_mongo.get(f"{url}/{anexo['id']}", headers=admin)
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"] == "application/octet-stream"
+    assert resposta.headers["content-disposition"].startswith("attachment;")
+    assert resposta.headers["x-content-type-options"] == "nosniff"
+    assert resposta.headers["content-security-policy"] == "sandbox"
+
+
+def test_download_pdf_com_range_e_etag(cliente_mongo, equipamento):
+    admin, url = equipamento
+    conteudo = b"%PDF-1.4 " + bytes(range(256)) * 4
+    anexo = enviar(cliente_mongo, equipamento, conteudo, "application/pdf", "manual.pdf")
+    assert anexo["sha256"] == hashlib.sha256(conteudo).hexdigest()
+
+    resposta = cliente_mongo.get(f"{url}/{anexo['id']}", headers=admin)
+    assert resposta.content == conteudo
+    assert resposta.headers["content-type"] == "application/pdf"
+    assert resposta.headers["content-disposition"].startswith("inline;")
+
+    resposta = cliente_mongo.get(f"{url}/{anexo['id']}", headers={**admin, "Range": "bytes=-10"})
+    assert resposta.status_code == 206
+    assert resposta.content == conteudo[-10:]
+    assert resposta.headers["content-range"] == f"bytes {len(conteudo) - 10}-{len(conteudo) - 1}/{len(conteudo)}"
+
+    resposta = cliente_mongo.get(
+        f"{url}/{anexo['id']}", headers={**admin, "Range": f"bytes={len(conteudo)}-"}
+    )
+    assert resposta.status_code == 416
+
+    etag = resposta.headers["etag"]
+    resposta = cliente_mongo.get(f"{url}/{anexo['id']}", headers={**admin, "If-None-Match": etag})
+    assert resposta.status_code == 304
+
+
+def test_deduplicacao_e_remocao(cliente_mongo, equipamento):
+    admin, url = equipamento
+    primeiro = enviar(cliente_mongo, equipamento, b"certificado", "application/pdf")
+    segundo = enviar(cliente_mongo, equipamento, b"certificado", "application/pdf")
+    arquivo = Path(server.ANEXOS_DIR) / primeiro["organizacao_id"] / primeiro["sha256"][:2] / primeiro["sha256"]
+    assert arquivo.exists()
+
+    # O arquivo continua enquanto outro anexo aponta para o mesmo conteúdo
+    assert cliente_mongo.delete(f"{url}/{primeiro['id']}", headers=admin).status_code == 200
+    assert arquivo.exists()
+    assert cliente_mongo.get(f"{url}/{segundo['id']}", headers=admin).content == b"certificado"
+
+    assert cliente_mongo.delete(f"{url}/{segundo['id']}", headers=admin).status_code == 200
+    assert not arquivo.exists()
+    assert cliente_mongo.get(f"{url}/{segundo['id']}", headers=admin).status_code == 404
+
+
+def test_limite_de_tamanho(cliente_mongo, equipamento, monkeypatch):
+    admin, url = equipamento
+    monkeypatch.setattr(server, "ANEXOS_MAX_MB", 0)
+    resposta = cliente_mongo.post(
+        url, params={"nome": "grande"}, content=b"x", headers={**admin, "Content-Type": "application/pdf"}
+    )
+    assert resposta.status_code == 413
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from tests.apoio import abrir_cliente, autorizacao, criar_usuario, login
+
+
+def test_login_refresh_logout(cliente):
+    assert cliente.post("/api/login", data={"username": "admin", "password": "errada"}).status_code == 401
+    tokens = login(cliente)
+    assert cliente.get("/api/me", headers=autorizacao(tokens)).json()["username"] == "admin"
+    # Senha incorreta depois do usuário criado
+    assert cliente.post("/api/login", data={"username": "admin", "password": "x"}).status_code == 401
+
+    resposta = cliente.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert resposta.status_code == 200
+    novos = resposta.json()
+    # Rotação: o token de renovação antigo não vale mais
+    resposta = cliente.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert resposta.status_code == 401
+
+    resposta = cliente.post(
+        "/api/logout", json={"refresh_token": novos["refresh_token"]}, headers=autorizacao(novos)
+    )
+    assert resposta.status_code == 200
+    assert cliente.get("/api/me", headers=autorizacao(novos)).status_code == 401
+    resposta = cliente.post("/api/token/refresh", json={"refresh_token": novos["refresh_token"]})
+    assert resposta.status_code == 401
+
+
+def test_isolamento_por_organizacao(cliente):
+    admin = autorizacao(login(cliente))
+    criar_usuario(cliente, "tecnico", "senha-b", "hospital-b")
+    outro = autorizacao(login(cliente, "tecnico", "senha-b"))
+
+    equipamento = cliente.post("/api/equipamentos", json={"nome": "Monitor"}, headers=admin).json()
+    cliente.post("/api/manutencoes", json={
+        "equipamento_id": equipamento["equipamento"]["id"], "status": "pendente"
+    }, headers=admin)
+    cliente.post("/api/equipamentos", json={"nome": "Bomba de infusão"}, headers=outro)
+
+    nomes = [e["nome"] for e in cliente.get("/api/equipamentos", headers=admin).json()["equipamentos"]]
+    assert nomes == ["Monitor"]
+    nomes = [e["nome"] for e in cliente.get("/api/equipamentos", headers=outro).json()["equipamentos"]]
+    assert nomes == ["Bomba de infusão"]
+    assert cliente.get("/api/manutencoes", headers=outro).json()["total"] == 0
+
+    relatorio = cliente.get("/api/relatorios", headers=outro).json()["relatorio"]
+    assert relatorio["equipamentos"]["total"] == 1
+    assert relatorio["manutencoes"] == {"total": 0, "pendentes": 0, "concluidas": 0}
+    relatorio = cliente.get("/api/relatorios", headers=admin).json()["relatorio"]
+    assert relatorio["equipamentos"]["total"] == 1
+    assert relatorio["manutencoes"] == {"total": 1, "pendentes": 1, "concluidas": 0}
+
+
+def test_janelas_de_notificacao(cliente):
+    admin = autorizacao(login(cliente))
+    agora = datetime.utcnow()
+    casos = {
+        "vencida": (agora - timedelta(days=3), "pendente"),
+        "proxima": (agora + timedelta(days=3), "em_andamento"),
+        "distante": (agora + timedelta(days=30), "pendente"),
+        "concluida": (agora - timedelta(days=3), "concluida"),
+    }
+    ids = {}
+    for nome, (data_prevista, status) in casos.items():
+        # Mesmo formato do frontend (Date.toISOString)
+        resposta = cliente.post("/api/manutencoes", json={
+            "data_prevista": data_prevista.isoformat(timespec="milliseconds") + "Z", "status": status
+        }, headers=admin)
+        ids[nome] = resposta.json()["manutencao"]["id"]
+
+    notificacoes = cliente.get("/api/notificacoes", headers=admin).json()["notificacoes"]
+    por_tipo = {n["tipo"]: n["mensagem"] for n in notificacoes}
+    assert len(notificacoes) == 2
+    assert ids["vencida"] in por_tipo["vencida"]
+    assert ids["proxima"] in por_tipo["proxima"]
+
+
+def test_data_invalida(cliente):
+    admin = autorizacao(login(cliente))
+    resposta = cliente.post("/api/manutencoes", json={"data_prevista": "amanhã"}, headers=admin)
+    assert resposta.status_code == 422
+
+
+def test_inicializacao_sem_chaves_jwt(tmp_path, monkeypatch):
+    cliente = abrir_cliente("memory", tmp_path, monkeypatch)
+    monkeypatch.setattr(server, "JWT_EPHEMERAL_KEYS", False)
+    monkeypatch.setattr(server, "JWT_KEYS_DIR", str(tmp_path))
+    server.get_key_set.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="JWT_KEYS_DIR"):
+            with cliente:
+                pass
+    finally:
+        server.get_key_set.cache_clear()
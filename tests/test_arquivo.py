@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from tests.apoio import autorizacao, login
+
+
+@pytest.fixture
+def admin(cliente_mongo):
+    return autorizacao(login(cliente_mongo))
+
+
+def inserir_manutencao(cliente, dias_atras, **campos):
+    data = datetime.utcnow() - timedelta(days=dias_atras)
+    manutencao = {
+        "id": f"m-{dias_atras}-{campos.get('tipo', 'preventiva')}",
+        "organizacao_id": server.DEFAULT_ORGANIZACAO,
+        "status": "concluida",
+        "created_at": data,
+        "updated_at": data + timedelta(hours=4),
+        **campos,
+    }
+    cliente.portal.call(server.db.manutencoes.insert_one, dict(manutencao))
+    return manutencao
+
+
+def ids(resposta):
+    return {m["id"] for m in resposta.json()["manutencoes"]}
+
+
+def test_periodo_so_com_data_fim_le_o_arquivo(cliente_mongo, admin):
+    antiga = inserir_manutencao(cliente_mongo, 800)
+    recente = inserir_manutencao(cliente_mongo, 10)
+    resposta = cliente_mongo.post("/api/manutencoes/arquivar", headers=admin)
+    assert resposta.json()["arquivadas"] == 1
+
+    # Sem período, só a coleção principal
+    assert ids(cliente_mongo.get("/api/manutencoes", headers=admin)) == {recente["id"]}
+
+    data_fim = (antiga["created_at"] + timedelta(days=1)).isoformat()
+    resposta = cliente_mongo.get("/api/manutencoes", params={"data_fim": data_fim}, headers=admin)
+    assert ids(resposta) == {antiga["id"]}
+    assert resposta.json()["manutencoes"][0]["arquivada"] is True
+
+    data_inicio = (antiga["created_at"] - timedelta(days=1)).isoformat()
+    resposta = cliente_mongo.get("/api/manutencoes", params={"data_inicio": data_inicio}, headers=admin)
+    assert ids(resposta) == {antiga["id"], recente["id"]}
+
+    resposta = cliente_mongo.get("/api/manutencoes", params={"incluir_arquivo": True}, headers=admin)
+    assert ids(resposta) == {antiga["id"], recente["id"]}
+
+    relatorio = cliente_mongo.get("/api/relatorios", headers=admin).json()["relatorio"]
+    assert relatorio["manutencoes"]["concluidas"] == 2
+
+
+def test_backfill_inclui_manutencoes_arquivadas(cliente_mongo, admin):
+    for dias_atras in (800, 10):
+        inserir_manutencao(
+            cliente_mongo, dias_atras, tipo="corretiva", equipamento_id="eq-1",
+            data_falha=datetime.utcnow() - timedelta(days=dias_atras)
+        )
+    assert cliente_mongo.post("/api/manutencoes/arquivar", headers=admin).json()["arquivadas"] == 1
+
+    resposta = cliente_mongo.post("/api/analytics/confiabilidade/backfill", headers=admin)
+    assert resposta.json()["manutencoes_processadas"] == 2
+    stats = cliente_mongo.get(
+        "/api/analytics/confiabilidade", params={"chave": "eq-1"}, headers=admin
+    ).json()["confiabilidade"]
+    assert len(stats) == 1
+    assert stats[0]["falhas"] == 2
+    assert stats[0]["reparos"] == 2
+    assert stats[0]["mtbf_horas"] == pytest.approx(790 * 24, abs=0.01)
+
+    # Reprocessar não conta os eventos duas vezes
+    cliente_mongo.post("/api/analytics/confiabilidade/backfill", headers=admin)
+    stats = cliente_mongo.get(
+        "/api/analytics/confiabilidade", params={"chave": "eq-1"}, headers=admin
+    ).json()["confiabilidade"]
+    assert stats[0]["falhas"] == 2
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from tests.apoio import autorizacao, login
+
+
+def test_formatar_confiabilidade():
+    horas = 3600
+    stats = {
+        "tipo_entidade": "equipamento",
+        "chave": "eq-1",
+        "falhas": 3,
+        "reparos": 3,
+        "intervalos": 2,
+        "tempo_entre_falhas_s": 480 * horas,
+        "tempo_reparo_s": 16 * horas,
+    }
+    resultado = server.formatar_confiabilidade(stats)
+    assert resultado["mtbf_horas"] == 240.0
+    assert resultado["mttr_horas"] == 5.33
+    assert resultado["tempo_parado_horas"] == 16.0
+    # (240 - 16/3) / 240: o reparo já está dentro do intervalo entre falhas
+    assert resultado["disponibilidade"] == 0.9778
+
+
+def test_confiabilidade_sem_intervalo_ou_reparo():
+    resultado = server.formatar_confiabilidade(
+        {"tipo_entidade": "equipamento", "chave": "eq-1", "falhas": 1}
+    )
+    assert resultado["mtbf_horas"] is None
+    assert resultado["mttr_horas"] is None
+    assert resultado["disponibilidade"] is None
+    assert resultado["falhas_em_aberto"] == 1
+
+
+def test_historico_de_falhas(cliente_mongo):
+    admin = autorizacao(login(cliente_mongo))
+    equipamento = cliente_mongo.post(
+        "/api/equipamentos", json={"nome": "Desfibrilador", "modelo": "DEA-300"}, headers=admin
+    ).json()["equipamento"]
+    inicio = datetime(2026, 1, 1)
+    # Falhas a cada 240 h, com reparos de 4 h, 6 h e 6 h
+    for horas_falha, horas_reparo in ((0, 4), (240, 6), (480, 6)):
+        data_falha = inicio + timedelta(hours=horas_falha)
+        resposta = cliente_mongo.post("/api/manutencoes", json={
+            "equipamento_id": equipamento["id"],
+            "tipo": "corretiva",
+            "status": "concluida",
+            "data_falha": data_falha.isoformat() + "Z",
+            "data_conclusao": (data_falha + timedelta(hours=horas_reparo)).isoformat() + "Z",
+        }, headers=admin)
+        assert resposta.status_code == 201
+
+    for tipo, chave in (("equipamento", equipamento["id"]), ("modelo", "DEA-300")):
+        resposta = cliente_mongo.get(
+            "/api/analytics/confiabilidade", params={"tipo": tipo, "chave": chave}, headers=admin
+        )
+        [stats] = resposta.json()["confiabilidade"]
+        assert stats["falhas"] == 3
+        assert stats["reparos"] == 3
+        assert stats["mtbf_horas"] == 240.0
+        assert stats["mttr_horas"] == 5.33
+        assert stats["disponibilidade"] == pytest.approx((240 - 16 / 3) / 240, abs=1e-4)
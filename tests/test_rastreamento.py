@@ -0,0 +1,19 @@
+import rastreamento
+from tests.apoio import abrir_cliente, autorizacao, login
+
+
+def test_spans_de_serializacao(tmp_path, monkeypatch):
+    with abrir_cliente("memory", tmp_path, monkeypatch) as cliente:
+        admin = autorizacao(login(cliente))
+        monkeypatch.setattr(rastreamento, "_exportacao_ativa", True)
+        rastreamento._coletar_spans()
+        assert cliente.get("/api/relatorios", headers=admin).status_code == 200
+        spans = {span.nome: span for span in rastreamento._coletar_spans()}
+
+    raiz = spans["GET /api/relatorios"]
+    # O jsonable_encoder e o json.dumps são medidos separadamente, ambos
+    # dentro do span da requisição
+    for nome in ("serializacao.encoder", "serializacao.json"):
+        assert spans[nome].trace_id == raiz.trace_id
+        assert spans[nome].parent_id == raiz.span_id
+    assert spans["serializacao.encoder"].fim_ns <= spans["serializacao.json"].inicio_ns
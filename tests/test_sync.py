@@ -0,0 +1,192 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from tests.apoio import autorizacao, login
+
+
+@pytest.fixture
+def admin(cliente_mongo):
+    return autorizacao(login(cliente_mongo))
+
+
+def enviar(cliente, admin, *changes):
+    resposta = cliente.post("/api/sync", json={"changes": list(changes)}, headers=admin)
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def motivos(resultado):
+    return [conflito["motivo"] for conflito in resultado["conflitos"]]
+
+
+def test_base_seq_desatualizada_gera_conflito(cliente_mongo, admin):
+    criado = enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": "eq-1", "data": {"nome": "A"}})
+    base = criado["aplicadas"][0]["sync_seq"]
+
+    editado = enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": "eq-1", "base_seq": base, "data": {"nome": "B"}
+    })
+    assert editado["aplicadas"][0]["sync_seq"] > base
+
+    # Outro cliente ainda conhece a versão anterior
+    resultado = enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": "eq-1", "base_seq": base, "data": {"nome": "C"}
+    })
+    assert resultado["aplicadas"] == []
+    assert motivos(resultado) == ["versao_desatualizada"]
+    assert resultado["conflitos"][0]["servidor"]["nome"] == "B"
+
+
+@pytest.mark.parametrize("existente", [True, False])
+def test_escrita_concorrente_entre_verificacao_e_gravacao(cliente_mongo, admin, monkeypatch, existente):
+    base = None
+    if existente:
+        criado = enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": "eq-1", "data": {"nome": "A"}})
+        base = criado["aplicadas"][0]["sync_seq"]
+    reservar = server.reservar_sync_seq
+
+    @asynccontextmanager
+    async def reservar_com_concorrente(tenant_db, organizacao_id, quantidade=1):
+        # Outro cliente grava depois das verificações e antes desta escrita
+        async with reservar(tenant_db, organizacao_id) as seq_outro:
+            await tenant_db.equipamentos.update_one(
+                {"organizacao_id": organizacao_id, "id": "eq-1"},
+                {"$set": {"nome": "outro", "sync_seq": seq_outro}},
+                upsert=True
+            )
+        async with reservar(tenant_db, organizacao_id, quantidade) as seq:
+            yield seq
+
+    monkeypatch.setattr(server, "reservar_sync_seq", reservar_com_concorrente)
+    resultado = enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": "eq-1", "base_seq": base, "data": {"nome": "B"}
+    })
+    assert resultado["aplicadas"] == []
+    assert motivos(resultado) == ["versao_desatualizada"]
+    assert resultado["conflitos"][0]["servidor"]["nome"] == "outro"
+
+
+def test_remocao_gera_tombstone(cliente_mongo, admin):
+    criado = enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": "eq-1", "data": {"nome": "A"}})
+    base = criado["aplicadas"][0]["sync_seq"]
+
+    removido = enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": "eq-1", "op": "delete", "base_seq": base
+    })
+    seq_remocao = removido["aplicadas"][0]["sync_seq"]
+
+    download = cliente_mongo.get("/api/sync", params={"since": str(base)}, headers=admin).json()
+    assert download["changes"]["equipamentos"] == []
+    assert download["deleted"] == [{"colecao": "equipamentos", "id": "eq-1", "sync_seq": seq_remocao}]
+
+    # Um upsert com a versão anterior à remoção não ressuscita o documento
+    resultado = enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": "eq-1", "base_seq": base, "data": {"nome": "A2"}
+    })
+    assert motivos(resultado) == ["removido_no_servidor"]
+    assert cliente_mongo.get("/api/equipamentos", headers=admin).json()["total"] == 0
+
+
+def test_paginacao_com_has_more(cliente_mongo, admin):
+    for i in range(3):
+        enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": f"eq-{i}", "data": {"nome": str(i)}})
+    for i in range(2):
+        enviar(cliente_mongo, admin, {"colecao": "manutencoes", "id": f"m-{i}", "data": {"status": "pendente"}})
+    atual = cliente_mongo.get("/api/sync", headers=admin).json()["changes"]["equipamentos"][0]
+    enviar(cliente_mongo, admin, {
+        "colecao": "equipamentos", "id": atual["id"], "op": "delete", "base_seq": atual["sync_seq"]
+    })
+
+    vistos = []
+    token = None
+    paginas = 0
+    while True:
+        params = {"limit": 2, **({"since": token} if token else {})}
+        pagina = cliente_mongo.get("/api/sync", params=params, headers=admin).json()
+        paginas += 1
+        itens = pagina["changes"]["equipamentos"] + pagina["changes"]["manutencoes"] + pagina["deleted"]
+        assert len(itens) <= 2
+        vistos.extend(item["sync_seq"] for item in itens)
+        token = pagina["sync_token"]
+        if not pagina["has_more"]:
+            break
+        assert len(itens) == 2
+
+    # Quatro documentos vivos (um equipamento foi removido) e um tombstone,
+    # cada um entregue uma única vez e em ordem de sync_seq
+    assert paginas == 3
+    assert len(vistos) == 5
+    assert vistos == sorted(set(vistos))
+    fim = cliente_mongo.get("/api/sync", params={"since": token}, headers=admin).json()
+    assert fim["has_more"] is False
+    assert fim["sync_token"] == token
+    assert fim["deleted"] == [] and fim["changes"] == {"equipamentos": [], "manutencoes": []}
+
+
+def test_watermark_segura_o_cursor_durante_a_escrita(cliente_mongo, admin):
+    enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": "eq-1", "data": {"nome": "A"}})
+    organizacao_id = server.DEFAULT_ORGANIZACAO
+
+    async def cenario():
+        tenant_db = await server.get_tenant_db(organizacao_id)
+        async with server.reservar_sync_seq(tenant_db, organizacao_id) as seq:
+            durante = await server.sync_watermark(tenant_db, organizacao_id)
+        depois = await server.sync_watermark(tenant_db, organizacao_id)
+        return seq, durante, depois
+
+    seq, durante, depois = cliente_mongo.portal.call(cenario)
+    assert durante == seq - 1
+    assert depois == seq
+
+
+def test_reserva_expirada_nao_segura_o_cursor(cliente_mongo, admin):
+    enviar(cliente_mongo, admin, {"colecao": "equipamentos", "id": "eq-1", "data": {"nome": "A"}})
+    organizacao_id = server.DEFAULT_ORGANIZACAO
+
+    async def cenario():
+        tenant_db = await server.get_tenant_db(organizacao_id)
+        # Reserva de uma réplica que caiu antes de liberá-la
+        await tenant_db.sync_counters.update_one({"_id": organizacao_id}, {"$push": {"pendentes": {
+            "id": "orfa", "minimo": 1, "expira_em": datetime.utcnow() - timedelta(seconds=1)
+        }}})
+        contador = await tenant_db.sync_counters.find_one({"_id": organizacao_id})
+        return contador["seq"], await server.sync_watermark(tenant_db, organizacao_id)
+
+    seq, watermark = cliente_mongo.portal.call(cenario)
+    assert watermark == seq
+
+
+def test_upsert_de_manutencao_arquivada(cliente_mongo, admin):
+    data = datetime.utcnow() - timedelta(days=800)
+    cliente_mongo.portal.call(server.db.manutencoes.insert_one, {
+        "id": "m-antiga",
+        "organizacao_id": server.DEFAULT_ORGANIZACAO,
+        "status": "concluida",
+        "created_at": data,
+        "updated_at": data,
+        "sync_seq": 0,
+    })
+    assert cliente_mongo.post("/api/manutencoes/arquivar", headers=admin).json()["arquivadas"] == 1
+
+    resultado = enviar(cliente_mongo, admin, {
+        "colecao": "manutencoes", "id": "m-antiga", "base_seq": 0, "data": {"status": "pendente"}
+    })
+    assert motivos(resultado) == ["arquivada"]
+    assert resultado["conflitos"][0]["servidor"]["arquivada"] is True
+    resultado = enviar(cliente_mongo, admin, {
+        "colecao": "manutencoes", "id": "m-antiga", "op": "delete", "base_seq": 0
+    })
+    assert motivos(resultado) == ["arquivada"]
+    assert cliente_mongo.get("/api/manutencoes", headers=admin).json()["total"] == 0
+
+
+def test_operacao_invalida(cliente_mongo, admin):
+    resultado = enviar(
+        cliente_mongo, admin,
+        {"colecao": "users", "id": "admin", "data": {"role": "admin"}},
+        {"colecao": "manutencoes", "id": "m-1", "data": {"data_prevista": "ontem"}},
+    )
+    assert motivos(resultado) == ["operacao_invalida", "operacao_invalida"]